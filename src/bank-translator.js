@@ -131,10 +131,10 @@ function translateBankOperation(bankData) {
   console.log('translateBankOperation. Existing patterns:', transactionPatterns.length);
   let rawData = [rawCaja, rawDate, concepto, importe];
   // Try to match with enhanced pattern matching
-  for (const pattern of transactionPatterns) {
+  for (const [index, pattern] of transactionPatterns.entries()) {
     if (pattern.matcher(rawData)) {
       console.log('Found matching pattern');
-      return {data: pattern.generator(rawData), description: pattern.description, patternId: pattern.patternId};
+      return {data: pattern.generator(rawData), description: pattern.description, patternId: `pattern_${index}`};
     }
   }
   
@@ -117,6 +117,7 @@ async function enhancedInit() {
             if (aiSuggestion && aiSuggestion.data.operaciones) {
                 originalTasksData = JSON.parse(JSON.stringify(aiSuggestion));
                 tasksData = aiSuggestion.data;
+                recordPattern(tasksData, aiSuggestion);
                 console.log('Received AI suggestion: task data', tasksData);
                 updateAISuggestionInfo(aiSuggestion);
                 renderTasks();
@@ -439,10 +440,22 @@ function rejectAllSuggestions() {
         tasksData.operaciones = [];
         tasksData.num_operaciones = 0;
         tasksData.liquido_operaciones = 0;
+        // Tasks entered by hand from here on do not come from the pattern
+        recordPattern(tasksData, null);
         renderTasks();
     }
 }
 
+/**
+ * Record the pattern that produced the tasks, for the pattern usage statistics.
+ * Suggestions without a patternId (the auto-generated fallback) record none.
+ */
+function recordPattern(tasks, suggestion) {
+    const fromPattern = Boolean(suggestion && suggestion.patternId);
+    tasks.pattern_id = fromPattern ? suggestion.patternId : null;
+    tasks.pattern_description = fromPattern ? (suggestion.description || null) : null;
+}
+
 /**
  * Save translation to file (legacy functionality)
  */
@@ -928,6 +941,7 @@ async function applyPattern(pattern) {
             
             // Update task data
             tasksData = result.data;
+            recordPattern(tasksData, result);
             
             // Update task count
             if (aiSuggestionCount) {
@@ -1,3 +1,4 @@
+import argparse
 import json
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
@@ -5,11 +6,30 @@ import os, re
 import subprocess
 import tempfile
 import sys
+import csv
+import datetime
+import hashlib
+import mmap
+import platform
+import queue
+import random
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 
 class SimpleJSEditor(scrolledtext.ScrolledText):
     """A simple JavaScript editor with basic syntax highlighting"""
     
-    def __init__(self, master=None, **kwargs):
+    def __init__(self, master=None, check_regex=False, on_warning=None, checker=None, check_kind=None,
+                 on_diagnostics=None, **kwargs):
         # Set default font for code
         if 'font' not in kwargs:
             kwargs['font'] = ('Consolas', 10)
@@ -17,12 +37,28 @@ class SimpleJSEditor(scrolledtext.ScrolledText):
         # Initialize ScrolledText widget
         super().__init__(master, **kwargs)
         
+        # Inline regex warnings (matcher editor only)
+        self.check_regex = check_regex
+        self.on_warning = on_warning
+        self.regex_warnings = []
+        self.regex_costs = {}
+        
+        # Live code checking, run after a pause in typing
+        self.checker = checker
+        self.check_kind = check_kind
+        self.on_diagnostics = on_diagnostics
+        self.diagnostics = []
+        self.check_job = None
+        
         # Create tags for syntax highlighting
         self.create_tags()
         
         # Bind events for syntax highlighting
         self.bind('<KeyRelease>', self.highlight_text)
         self.bind('<FocusIn>', self.highlight_text)
+        self.bind('<KeyRelease>', self.schedule_check, add='+')
+        for tag in ('regex_warning', 'regex_cost', 'check_error', 'check_warning'):
+            self.tag_bind(tag, '<Enter>', self.show_warning)
         
     def create_tags(self):
         # Define colors for different syntax elements
@@ -32,6 +68,10 @@ class SimpleJSEditor(scrolledtext.ScrolledText):
         self.tag_configure('function', foreground='#800080') # Purple
         self.tag_configure('number', foreground='#FF8000')   # Orange
         self.tag_configure('operator', foreground='#B22222') # Firebrick
+        self.tag_configure('regex_warning', background='#FFE4E1', underline=True)
+        self.tag_configure('regex_cost')  # Hover text only
+        self.tag_configure('check_error', background='#FFB6B6', underline=True)
+        self.tag_configure('check_warning', background='#FFF3B0', underline=True)
         
     def highlight_text(self, event=None):
         # Delete all existing tags
@@ -101,6 +141,67 @@ class SimpleJSEditor(scrolledtext.ScrolledText):
             # Escape special regex characters
             escaped_op = re.escape(op)
             self.highlight_pattern(escaped_op, 'operator')
+        
+        if self.check_regex:
+            self.mark_regex_warnings()
+    
+    def mark_regex_warnings(self):
+        """Underline regex literals prone to backtracking or measured as slow"""
+        self.tag_remove('regex_warning', '1.0', 'end')
+        self.tag_remove('regex_cost', '1.0', 'end')
+        self.regex_warnings = []
+        
+        for start, end, source, flags in find_regex_literals(self.get('1.0', 'end-1c')):
+            warnings = regex_backtracking_warnings(source, flags)
+            cost = self.regex_costs.get((source, flags))
+            messages = list(warnings)
+            if cost is not None:
+                messages.append(f"Measured worst case: {cost:.1f} ms")
+            if not messages:
+                continue
+            # Regexes measured as fast only show their cost when hovered
+            slow = cost is not None and cost >= REGEX_SLOW_MS
+            tag = 'regex_warning' if warnings or slow else 'regex_cost'
+            self.tag_add(tag, f"1.0+{start}c", f"1.0+{end}c")
+            self.regex_warnings.append((start, end, f"/{source}/{flags}: " + "; ".join(messages)))
+    
+    def schedule_check(self, event=None):
+        # Restart the pause timer on every key
+        if not self.checker:
+            return
+        if self.check_job:
+            self.after_cancel(self.check_job)
+        self.check_job = self.after(CHECK_PAUSE_MS, self.run_check)
+    
+    def run_check(self):
+        """Check the code now and mark the problems found"""
+        self.check_job = None
+        if not self.checker:
+            return
+        diagnostics, complete = self.checker.check(self.get('1.0', 'end-1c'), self.check_kind)
+        
+        self.tag_remove('check_error', '1.0', 'end')
+        self.tag_remove('check_warning', '1.0', 'end')
+        for severity, start, end, message in diagnostics:
+            self.tag_add('check_' + severity, f"1.0+{start}c", f"1.0+{end}c")
+        self.diagnostics = diagnostics
+        
+        if self.on_diagnostics:
+            self.on_diagnostics(diagnostics)
+        if not complete:
+            # The syntax checker was busy, try again shortly
+            self.check_job = self.after(CHECK_PAUSE_MS, self.run_check)
+    
+    def show_warning(self, event=None):
+        # Report the warning or problem under the mouse
+        if not self.on_warning:
+            return
+        offset = len(self.get('1.0', 'current'))
+        problems = [(start, end, message) for _, start, end, message in self.diagnostics]
+        for start, end, message in problems + self.regex_warnings:
+            if start <= offset < end:
+                self.on_warning(message)
+                break
     
     def highlight_pattern(self, pattern, tag):
         # Find and tag all occurrences of the pattern
@@ -123,6 +224,1966 @@ class SimpleJSEditor(scrolledtext.ScrolledText):
             self.tag_add(tag, f"{start_line}.{start_col}", f"{end_line}.{end_col}")
 
 
+# Corpus evaluation
+#
+# A corpus is a list of bank movements in the same shape the matchers receive:
+# [caja, fecha, concepto, importe]. Evaluation runs every pattern over every
+# row with first-match semantics (same as translateBankOperation in
+# bank-translator.js): a truthy matcher result is a match and a throwing
+# matcher ends the translation of the row, which is reported. Rows are sharded by caja and date range and each shard
+# is evaluated by its own Node.js process, so the work spreads over all cores.
+
+# Rows per line streamed back by the evaluator (also the progress granularity)
+CORPUS_CHUNK_SIZE = 500
+
+# Shards per worker, so a slow caja does not leave the other cores idle
+SHARDS_PER_WORKER = 4
+
+# Helper functions available to matcher/generator code, as in the test dialog
+JS_HELPERS = """
+function formatearFecha(fecha) {
+    return fecha;  // Simplified for test
+}
+
+function obtenerMes(fecha) {
+    const date = new Date(fecha);
+    return ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN",
+           "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"][date.getMonth()];
+}
+"""
+
+# Common part of the Node.js shard scripts. Usage: node script.js <job.json> <rows.json> <chunk>
+# A script calls emit() once per row, in order, and flush() at the end; every
+# chunk of rows is printed as one compact JSON array.
+JS_SHARD_PREAMBLE = JS_HELPERS + """
+const fs = require('fs');
+
+const job = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+const rows = JSON.parse(fs.readFileSync(process.argv[3], 'utf8'));
+const chunkSize = parseInt(process.argv[4], 10) || 500;
+
+// Pattern code must not write to stdout, which carries the results
+console.log = console.info = console.warn = console.error = () => {};
+
+function compile(source) {
+    try {
+        return new Function('formatearFecha', 'obtenerMes', 'return ' + source)(formatearFecha, obtenerMes);
+    } catch (e) {
+        return null;  // Code that does not compile is reported by the caller
+    }
+}
+
+// Same normalization as translateBankOperation in bank-translator.js
+function rawRow(row) {
+    const [caja, fecha, concepto, importe] = row;
+    return [String(caja).split('_')[0], String(fecha).replace(/\\D/g, ''), concepto, importe];
+}
+
+let chunk = [];
+function emit(entry) {
+    chunk.push(entry);
+    if (chunk.length === chunkSize) {
+        flush();
+    }
+}
+function flush() {
+    if (chunk.length) {
+        process.stdout.write(JSON.stringify(chunk) + '\\n');
+        chunk = [];
+    }
+}
+"""
+
+# Shard evaluator: job.matchers holds the matcher sources. Emits the index of
+# the first matching pattern for each row (-1 when no pattern matches), or
+# [index, message] when that matcher throws before any pattern matches.
+CORPUS_EVALUATOR_JS = JS_SHARD_PREAMBLE + """
+const matchers = job.matchers.map(compile);  // Patterns that do not compile never match
+
+for (const row of rows) {
+    const rawData = rawRow(row);
+    let hit = -1;
+    for (let p = 0; p < matchers.length; p++) {
+        if (!matchers[p]) continue;
+        try {
+            if (matchers[p](rawData)) {
+                hit = p;
+                break;
+            }
+        } catch (e) {
+            // translateBankOperation does not try the next pattern either
+            hit = [p, String(e && e.message !== undefined ? e.message : e)];
+            break;
+        }
+    }
+    emit(hit);
+}
+flush();
+"""
+
+
+def default_worker_count():
+    """Number of evaluator processes to run in parallel"""
+    return os.cpu_count() or 1
+
+
+def fecha_sort_key(fecha):
+    """Return a sortable YYYYMMDD string for the date formats found in bank exports"""
+    fecha = str(fecha).strip()
+    match = re.match(r'^(\d{4})-(\d{2})-(\d{2})', fecha)
+    if match:
+        return ''.join(match.groups())
+    match = re.match(r'^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})', fecha)
+    if match:
+        day, month, year = match.groups()
+        return f"{year}{int(month):02d}{int(day):02d}"
+    digits = re.sub(r'\D', '', fecha)
+    if len(digits) == 8:
+        # ddmmYYYY, as produced by limpiarFecha
+        return digits[4:8] + digits[2:4] + digits[0:2]
+    return fecha
+
+
+def shard_corpus(rows, shard_count):
+    """Split row indices into shards of one caja and a contiguous date range.
+
+    Returns a list of (caja, first_date, last_date, indices) tuples. Every row
+    index appears in exactly one shard.
+    """
+    if isinstance(rows, CorpusCache):
+        keys = rows.caja_fecha()  # Without decoding the concepts
+    else:
+        keys = ((row[0], row[1]) for row in rows)
+
+    by_caja = {}
+    fechas = []
+    for index, (caja, fecha) in enumerate(keys):
+        by_caja.setdefault(str(caja).split('_')[0], []).append(index)
+        fechas.append(fecha)
+    sort_keys = {fecha: fecha_sort_key(fecha) for fecha in set(fechas)}
+
+    target_size = max(1, -(-len(fechas) // max(1, shard_count)))
+
+    shards = []
+    for caja in sorted(by_caja):
+        indices = sorted(by_caja[caja], key=lambda i: sort_keys[fechas[i]])
+        for start in range(0, len(indices), target_size):
+            part = indices[start:start + target_size]
+            shards.append((caja, fechas[part[0]], fechas[part[-1]], part))
+    return shards
+
+
+def load_corpus_file(file_path):
+    """Load a test corpus from a JSON list of rows (lists or objects with the
+    caja, fecha, concepto and importe fields), a caja,fecha,concepto,importe CSV
+    or a corpus cache built from bank exports"""
+    if file_path.lower().endswith('.corpus'):
+        return CorpusCache(file_path)
+    if file_path.lower().endswith('.json'):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if not isinstance(data, list):
+            raise ValueError("The corpus must be a JSON list of movements")
+        rows = []
+        for number, row in enumerate(data, 1):
+            if isinstance(row, dict):
+                row = [row.get(field) for field in DATA_FIELDS]
+            elif not isinstance(row, list) or len(row) < 4:
+                raise ValueError(f"Movement {number} is not a [caja, fecha, concepto, importe] list")
+            rows.append(row[:4])
+        return rows
+
+    rows = []
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as file:
+        for record in csv.reader(file):
+            if len(record) < 4:
+                continue
+            if record[0].strip().lower() == 'caja':
+                continue  # Header line
+            caja, fecha, concepto, importe = record[:4]
+            try:
+                importe = float(importe)
+            except ValueError:
+                pass
+            rows.append([caja, fecha, concepto, importe])
+    return rows
+
+
+def run_corpus_shards(script, job, rows, handle_chunk, workers=None, progress=None, chunk_size=CORPUS_CHUNK_SIZE,
+                      shards=None):
+    """Run a Node.js shard script over the corpus in parallel.
+
+    The corpus is sharded by caja and date range (unless ``shards`` from
+    shard_corpus are given) and each shard is run by its own Node.js process. For every chunk streamed back, handle_chunk(indices,
+    entries) is called with the corpus indices of the entries. ``progress`` is
+    called as progress(shard_index, rows_done, shard_rows). Both are called
+    from worker threads and must be thread safe. Returns the shards.
+    """
+    workers = workers or default_worker_count()
+    if shards is None:
+        shards = shard_corpus(rows, workers * SHARDS_PER_WORKER)
+    work_dir = tempfile.mkdtemp(prefix='pattern-corpus-')
+    try:
+        script_path = os.path.join(work_dir, 'script.js')
+        with open(script_path, 'w', encoding='utf-8') as file:
+            file.write(script)
+
+        job_path = os.path.join(work_dir, 'job.json')
+        with open(job_path, 'w', encoding='utf-8') as file:
+            json.dump(job, file)
+
+        def run_shard(shard_index):
+            indices = shards[shard_index][3]
+            rows_path = os.path.join(work_dir, f'shard-{shard_index}.json')
+            with open(rows_path, 'w', encoding='utf-8') as file:
+                json.dump([rows[i] for i in indices], file)
+
+            process = subprocess.Popen(
+                ["node", script_path, job_path, rows_path, str(chunk_size)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8'
+            )
+            done = 0
+            for line in process.stdout:
+                # Each line holds the entries for the next chunk of this shard
+                entries = json.loads(line)
+                handle_chunk(indices[done:done + len(entries)], entries)
+                done += len(entries)
+                if progress:
+                    progress(shard_index, done, len(indices))
+            stderr = process.stderr.read()
+            if process.wait() != 0 or done != len(indices):
+                raise RuntimeError(f"Node.js worker failed on shard {shard_index}: {stderr.strip()}")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Each thread only waits on its Node.js process, the evaluation
+            # itself runs in parallel in the worker processes
+            for future in [pool.submit(run_shard, i) for i in range(len(shards))]:
+                future.result()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return shards
+
+
+def evaluate_corpus(patterns, rows, workers=None, progress=None, chunk_size=CORPUS_CHUNK_SIZE, errors=None,
+                    shards=None):
+    """Run all matchers over the corpus and return the first matching pattern per row.
+
+    The result is a list parallel to ``rows`` holding the index of the first
+    pattern whose matcher returns a truthy value, or -1. Rows where a matcher
+    throws first are -1 too; if ``errors`` is a dict they are recorded in it as
+    {row index: (pattern index, message)}. ``progress`` is called from the
+    worker threads as progress(shard_index, rows_done, shard_rows) and must be
+    thread safe. ``shards`` is passed on to run_corpus_shards.
+    """
+    results = [-1] * len(rows)
+    if not rows or not patterns:
+        return results
+
+    def store(indices, hits):
+        for index, hit in zip(indices, hits):
+            if isinstance(hit, list):
+                if errors is not None:
+                    errors[index] = tuple(hit)
+                continue
+            results[index] = hit
+
+    job = {"matchers": [p.get('matcherFunction', '') for p in patterns]}
+    run_corpus_shards(CORPUS_EVALUATOR_JS, job, rows, store, workers=workers, progress=progress,
+                      chunk_size=chunk_size, shards=shards)
+    return results
+
+
+def benchmark_corpus_evaluation(patterns, rows, worker_counts=(1, 2, 4, 8)):
+    """Time evaluate_corpus with different worker counts.
+
+    Returns a list of (workers, seconds, rows_per_second, speedup) tuples, with
+    the speedup relative to the first worker count.
+    """
+    timings = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        evaluate_corpus(patterns, rows, workers=workers)
+        elapsed = time.perf_counter() - start
+        timings.append((workers, elapsed))
+
+    base = timings[0][1] if timings else 0
+    return [
+        (workers, elapsed, len(rows) / elapsed if elapsed else 0, base / elapsed if elapsed else 0)
+        for workers, elapsed in timings
+    ]
+
+
+# Bank statement ingestion
+#
+# Raw XLSX/XLS/CSV exports from the banks are streamed row by row into a
+# corpus cache, so multi-year statements can be used as a test corpus without
+# holding them in memory. Each bank's layout and normalization follows
+# processFile in services/fileImport.js, so the rows match what the app stores
+# in the database and passes to the matchers.
+
+# Bank exports recognised by file name, in the order processFile checks them:
+# (prefix, extension, first data row, columns, caja, {account suffix: caja})
+BANK_EXPORTS = [
+    ('CRURAL', '.XLSX', 4,
+     ['FECHA', 'FVALOR', 'CONCEPTO', 'IMPORTE', 'SALDO', 'NUM_APUNTE'],
+     '203_CRURAL - 0727', {'8923': '239_CRURAL_MUR_8923'}),
+    ('CAIXABANK', '.XLS', 3,
+     ['FECHA', 'FVALOR', 'CONCEPTO', 'CONCEPTOADIC', 'IMPORTE', 'SALDO'],
+     '200_CAIXABNK - 2064', {'3616': '204_CAIXABNK_REC_3616'}),
+    ('UNICAJA', '.XLS', 10,
+     ['FECHA', 'FVALOR', 'CONCEPTO', 'IMPORTE', 'DIVISA', 'SALDO', 'DIVISASALDO', 'NUM_MOV'],
+     '238_UNICAJA_(PP2022)-8476', {'8822': '240_UNICAJA_(PP2023)-8822'}),
+    ('BBVA', '.XLSX', 16,
+     ['COL_VOID_1', 'COL_VOID_2', 'FECHA', 'FVALOR', 'CODIGO', 'CONCEPTO', 'BENEFIARIO_ORDENANTE',
+      'OBSERVACIONES', 'IMPORTE', 'SALDO'],
+     '207_BBVA - 0342', {'9994': '233_BBVA_PCONTIGO_9994'}),
+    ('SANTANDER', '.XLSX', 8,
+     ['FECHA', 'FVALOR', 'CONCEPTO', 'IMPORTE', 'DIVISA', 'SALDO', 'DIVISA_SALDO', 'CODIGO'],
+     '201_SANTANDER - 2932', {'9994': '20X_SANTANDER_RECAUDA_XX'}),
+]
+
+# Month names accepted in CRURAL dates such as "30-may-25" (normalizeCruralRawDate)
+CRURAL_MONTHS = {
+    'ene': 1, 'jan': 1, 'enero': 1, 'january': 1,
+    'feb': 2, 'febrero': 2, 'february': 2,
+    'mar': 3, 'marzo': 3, 'march': 3,
+    'abr': 4, 'abril': 4, 'april': 4, 'apr': 4,
+    'may': 5, 'mayo': 5,
+    'jun': 6, 'junio': 6, 'june': 6,
+    'jul': 7, 'julio': 7, 'july': 7,
+    'ago': 8, 'agosto': 8, 'august': 8, 'aug': 8,
+    'sep': 9, 'septiembre': 9, 'september': 9,
+    'oct': 10, 'octubre': 10, 'october': 10,
+    'nov': 11, 'noviembre': 11, 'november': 11,
+    'dic': 12, 'diciembre': 12, 'december': 12, 'dec': 12,
+}
+
+# Built-in XLSX number formats that display dates
+XLSX_DATE_FORMATS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+
+# Rows between two progress reports while ingesting
+INGEST_PROGRESS_ROWS = 10000
+
+
+def identify_bank_export(file_path):
+    """Return the BANK_EXPORTS entry and caja for an export file, or (None, None).
+
+    As in processFile, the file name must start with the bank name and the
+    account is told apart by the last digits of the name. CSV copies of an
+    export are accepted too.
+    """
+    name, extension = os.path.splitext(os.path.basename(file_path).upper())
+    for export in BANK_EXPORTS:
+        prefix, bank_extension, _, _, caja, accounts = export
+        if name.startswith(prefix) and extension in (bank_extension, '.CSV'):
+            for suffix, account_caja in accounts.items():
+                if name.endswith(suffix):
+                    caja = account_caja
+            return export, caja
+    return None, None
+
+
+def parse_spanish_number(value):
+    """Parse an amount the way parseSpanishNumber does in fileImport.js.
+
+    Numeric cells are returned as they are. Text has its ',' removed and is
+    parsed like JavaScript's parseFloat (longest numeric prefix); None when
+    nothing can be parsed.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not value or not isinstance(value, str):
+        return None
+    match = re.match(r'\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)', value.replace(',', ''))
+    return float(match.group(1)) if match else None
+
+
+def format_export_date(value):
+    """Format a date cell as the app stores it (dd/mm/yyyy, es-ES); text is kept as is"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return f"{value.day:02d}/{value.month:02d}/{value.year}"
+    return str(value).strip() if value is not None else ''
+
+
+def normalize_crural_raw_date(value):
+    """Turn a CRURAL date ("30-may-25") into dd/mm/yyyy, like normalizeCruralRawDate"""
+    if not isinstance(value, str) or value.count('-') != 2:
+        return format_export_date(value)
+    day, month_name, year = value.strip().split('-')
+    month = CRURAL_MONTHS.get(month_name.lower())
+    if not month:
+        raise ValueError(f"Unknown month: {month_name}")
+    if len(year) == 2:
+        year = '20' + year
+    return f"{int(day):02d}/{month:02d}/{year}"
+
+
+def bank_movement(bank, record, caja):
+    """Build a corpus row [caja, fecha, concepto, importe] from one export record.
+
+    Mirrors the process*Records functions of fileImport.js for each bank.
+    """
+    def text(name):
+        value = record.get(name)
+        return '' if value is None else str(value)
+
+    if bank == 'CRURAL':
+        return [caja, normalize_crural_raw_date(record.get('FECHA')), text('CONCEPTO'),
+                parse_spanish_number(record.get('IMPORTE'))]
+    if bank == 'CAIXABANK':
+        concepto = text('CONCEPTO') + ' | ' + text('CONCEPTOADIC')
+    elif bank == 'UNICAJA':
+        concepto = text('CONCEPTO') + ' | '
+    elif bank == 'BBVA':
+        concepto = (text('CONCEPTO') + ' | ' + text('OBSERVACIONES') + ' | '
+                    + (text('BENEFIARIO_ORDENANTE') or 'N/D'))
+    else:
+        concepto = text('CONCEPTO')
+    return [caja, format_export_date(record.get('FECHA')), concepto, parse_spanish_number(record.get('IMPORTE'))]
+
+
+def _xml_name(element):
+    """Tag of an XML element without its namespace"""
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _xlsx_column_index(reference):
+    """0-based column of a cell reference such as 'C12'"""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _xlsx_first_sheet(archive):
+    """Path inside the archive of the first worksheet"""
+    relationships = {}
+    with archive.open('xl/_rels/workbook.xml.rels') as file:
+        for element in ET.parse(file).getroot():
+            relationships[element.get('Id')] = element.get('Target')
+    with archive.open('xl/workbook.xml') as file:
+        workbook = ET.parse(file).getroot()
+    date1904 = any(_xml_name(e) == 'workbookPr' and e.get('date1904') in ('1', 'true') for e in workbook.iter())
+    for element in workbook.iter():
+        if _xml_name(element) == 'sheet':
+            rel_id = next(value for key, value in element.attrib.items() if key.endswith('}id'))
+            target = relationships[rel_id]
+            path = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+            return path, date1904
+    raise ValueError("The workbook has no sheets")
+
+
+def _xlsx_shared_strings(archive):
+    """Read the shared string table, the only part of an XLSX kept in memory"""
+    strings = []
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    with archive.open('xl/sharedStrings.xml') as file:
+        for _, element in ET.iterparse(file):
+            if _xml_name(element) != 'si':
+                continue
+            parts = []
+            for child in element:
+                if _xml_name(child) == 't':
+                    parts.append(child.text or '')
+                elif _xml_name(child) == 'r':
+                    parts.extend(t.text or '' for t in child if _xml_name(t) == 't')
+            strings.append(''.join(parts))
+            element.clear()
+    return strings
+
+
+def _xlsx_date_styles(archive):
+    """Return the set of cell style indices whose number format shows a date"""
+    if 'xl/styles.xml' not in archive.namelist():
+        return set()
+    with archive.open('xl/styles.xml') as file:
+        styles = ET.parse(file).getroot()
+
+    date_formats = set(XLSX_DATE_FORMATS)
+    for element in styles.iter():
+        if _xml_name(element) == 'numFmt':
+            code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', '', element.get('formatCode', '')).lower()
+            if re.search(r'[dy]|m(?!m?:)', code):
+                date_formats.add(int(element.get('numFmtId')))
+
+    date_styles = set()
+    for element in styles:
+        if _xml_name(element) == 'cellXfs':
+            for index, xf in enumerate(element):
+                if int(xf.get('numFmtId', 0)) in date_formats:
+                    date_styles.add(index)
+    return date_styles
+
+
+def iter_xlsx_rows(file_path):
+    """Stream the rows of the first sheet of an XLSX file.
+
+    Yields (row_number, cells) with 0-based row numbers and cell values as
+    str, float, bool or datetime. Rows are parsed with iterparse and dropped
+    as soon as they are yielded, so memory use does not grow with the sheet.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_path, date1904 = _xlsx_first_sheet(archive)
+        shared_strings = _xlsx_shared_strings(archive)
+        date_styles = _xlsx_date_styles(archive)
+        epoch = datetime.datetime(1904, 1, 1) if date1904 else datetime.datetime(1899, 12, 30)
+
+        with archive.open(sheet_path) as file:
+            sheet_data = None
+            next_row = 0
+            for event, element in ET.iterparse(file, events=('start', 'end')):
+                name = _xml_name(element)
+                if event == 'start':
+                    if name == 'sheetData':
+                        sheet_data = element
+                    continue
+                if name != 'row':
+                    continue
+
+                row_number = int(element.get('r', next_row + 1)) - 1
+                next_row = row_number + 1
+                cells = []
+                for column, cell in enumerate(element):
+                    reference = cell.get('r')
+                    if reference:
+                        column = _xlsx_column_index(reference)
+                    kind = cell.get('t', 'n')
+                    value = None
+                    if kind == 'inlineStr':
+                        value = ''.join(t.text or '' for t in cell.iter() if _xml_name(t) == 't')
+                    else:
+                        raw = next((child.text for child in cell if _xml_name(child) == 'v'), None)
+                        if raw is None:
+                            pass
+                        elif kind == 's':
+                            value = shared_strings[int(raw)]
+                        elif kind == 'b':
+                            value = raw == '1'
+                        elif kind in ('str', 'e'):
+                            value = raw
+                        else:
+                            value = float(raw)
+                            if int(cell.get('s', 0)) in date_styles:
+                                value = epoch + datetime.timedelta(days=value)
+                    if value is not None:
+                        cells.extend([None] * (column + 1 - len(cells)))
+                        cells[column] = value
+                yield row_number, cells
+
+                element.clear()
+                if sheet_data is not None:
+                    sheet_data.remove(element)
+
+
+def iter_xls_rows(file_path):
+    """Stream the rows of the first sheet of a legacy .XLS (BIFF) file.
+
+    Reading BIFF needs the optional xlrd package, which loads one sheet at a
+    time. Files saved as XLSX with an .XLS name are streamed as XLSX.
+    """
+    if zipfile.is_zipfile(file_path):
+        yield from iter_xlsx_rows(file_path)
+        return
+    try:
+        import xlrd
+    except ImportError:
+        raise RuntimeError("Reading .XLS exports needs the xlrd package (pip install xlrd)")
+
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for row_number in range(sheet.nrows):
+            cells = []
+            for cell in sheet.row(row_number):
+                if cell.ctype == xlrd.XL_CELL_DATE:
+                    cells.append(xlrd.xldate_as_datetime(cell.value, book.datemode))
+                elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    cells.append(None)
+                else:
+                    cells.append(cell.value)
+            yield row_number, cells
+        book.unload_sheet(0)
+    finally:
+        book.release_resources()
+
+
+def iter_csv_rows(file_path):
+    """Stream the rows of a CSV file, detecting ',' or ';' as separator"""
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for row_number, cells in enumerate(csv.reader(file, dialect)):
+            yield row_number, [cell if cell != '' else None for cell in cells]
+
+
+def iter_export_rows(file_path):
+    """Stream the raw rows of a bank export or corpus file as (row_number, cells)"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.xlsx':
+        return iter_xlsx_rows(file_path)
+    if extension == '.xls':
+        return iter_xls_rows(file_path)
+    if extension == '.csv':
+        return iter_csv_rows(file_path)
+    raise ValueError(f"Unsupported export format: {os.path.basename(file_path)}")
+
+
+def iter_export_movements(file_path):
+    """Stream the movements of one file as corpus rows [caja, fecha, concepto, importe].
+
+    Bank exports are recognised by name (see identify_bank_export). Any other
+    CSV is read as caja,fecha,concepto,importe, like load_corpus_file. Blank
+    and summary rows without a date are skipped.
+    """
+    export, caja = identify_bank_export(file_path)
+    if export is None:
+        if not file_path.lower().endswith('.csv'):
+            raise ValueError(f"{os.path.basename(file_path)} is not a known bank export "
+                             "(the name must start with " + ", ".join(e[0] for e in BANK_EXPORTS) + ")")
+        for _, cells in iter_csv_rows(file_path):
+            if len(cells) < 4 or not cells[1] or str(cells[0]).strip().lower() == 'caja':
+                continue
+            importe = parse_spanish_number(cells[3])
+            yield [cells[0] or '', cells[1], cells[2] or '', importe]
+        return
+
+    bank, _, first_row, columns = export[:4]
+    for row_number, cells in iter_export_rows(file_path):
+        if row_number < first_row or not cells or cells[columns.index('FECHA')] in (None, ''):
+            continue
+        record = dict(zip(columns, cells))
+        try:
+            yield bank_movement(bank, record, caja)
+        except ValueError as e:
+            raise ValueError(f"{os.path.basename(file_path)}, row {row_number + 1}: {e}")
+
+
+def ingest_bank_exports(file_paths, cache_path, progress=None):
+    """Stream bank exports into a corpus cache file.
+
+    ``progress`` is called as progress(file_index, rows_done) every
+    INGEST_PROGRESS_ROWS rows and at the end of each file. Returns the number
+    of movements read from each file.
+    """
+    writer = CorpusCacheWriter(cache_path)
+    counts = []
+    try:
+        for file_index, file_path in enumerate(file_paths):
+            count = 0
+            for movement in iter_export_movements(file_path):
+                writer.add(*movement)
+                count += 1
+                if progress and count % INGEST_PROGRESS_ROWS == 0:
+                    progress(file_index, count)
+            counts.append(count)
+            if progress:
+                progress(file_index, count)
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    return counts
+
+
+# Corpus cache
+#
+# Columnar file holding a corpus: caja and fecha dictionary encoded, importe
+# as float64 and the concepts as one UTF-8 blob with an offsets column. The
+# file is memory-mapped when opened and rows are decoded on access, so opening
+# takes the same time whatever the size of the corpus.
+#
+# Layout: magic, header size (uint64), JSON header, then every column aligned
+# to 8 bytes. Column offsets in the header are relative to the first column.
+
+CORPUS_CACHE_MAGIC = b'PCORPUS1'
+
+# Column name -> array typecode ('B' for the concept bytes)
+CORPUS_CACHE_COLUMNS = OrderedDict([
+    ('caja', 'H'),
+    ('fecha', 'I'),
+    ('importe', 'd'),
+    ('concepto_offsets', 'Q'),
+    ('concepto', 'B'),
+])
+
+# Rows buffered by CorpusCacheWriter before spilling them to disk
+CORPUS_CACHE_BUFFER_ROWS = 8192
+
+
+class CorpusCacheWriter:
+    """Write a corpus cache one row at a time in constant memory.
+
+    Columns are spilled to temporary files as rows are added and joined into
+    the cache by close(). Only the caja and fecha dictionaries stay in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.work_dir = tempfile.mkdtemp(prefix='pattern-cache-')
+        self.files = {
+            name: open(os.path.join(self.work_dir, name), 'wb') for name in CORPUS_CACHE_COLUMNS
+        }
+        self.buffers = {name: array(typecode) for name, typecode in CORPUS_CACHE_COLUMNS.items()}
+        self.cajas = {}
+        self.fechas = {}
+        self.rows = 0
+        self.concepto_size = 0
+        self.buffers['concepto_offsets'].append(0)
+
+    def add(self, caja, fecha, concepto, importe):
+        """Append one row [caja, fecha, concepto, importe]"""
+        caja = '' if caja is None else str(caja)
+        fecha = '' if fecha is None else str(fecha)
+        if caja not in self.cajas and len(self.cajas) > 0xFFFF:
+            raise ValueError("Too many different cajas for a corpus cache")
+        self.buffers['caja'].append(self.cajas.setdefault(caja, len(self.cajas)))
+        self.buffers['fecha'].append(self.fechas.setdefault(fecha, len(self.fechas)))
+        self.buffers['importe'].append(float('nan') if importe is None else float(importe))
+
+        encoded = ('' if concepto is None else str(concepto)).encode('utf-8')
+        self.buffers['concepto'].frombytes(encoded)
+        self.concepto_size += len(encoded)
+        self.buffers['concepto_offsets'].append(self.concepto_size)
+
+        self.rows += 1
+        if self.rows % CORPUS_CACHE_BUFFER_ROWS == 0:
+            self._spill()
+
+    def _spill(self):
+        for name, buffer in self.buffers.items():
+            buffer.tofile(self.files[name])
+            del buffer[:]
+
+    def close(self):
+        """Write the cache file and remove the temporary column files"""
+        try:
+            self._spill()
+            columns = {}
+            offset = 0
+            for name, typecode in CORPUS_CACHE_COLUMNS.items():
+                self.files[name].close()
+                size = os.path.getsize(os.path.join(self.work_dir, name))
+                columns[name] = [offset, size, typecode]
+                offset += -(-size // 8) * 8
+            header = json.dumps({
+                "rows": self.rows,
+                "byteorder": sys.byteorder,
+                "cajas": list(self.cajas),
+                "fechas": list(self.fechas),
+                "columns": columns,
+            }).encode('utf-8')
+            header += b' ' * (-(len(CORPUS_CACHE_MAGIC) + 8 + len(header)) % 8)
+
+            # Written next to the cache and renamed into place, so a failed write
+            # leaves the previous cache intact and a mapped cache is never truncated
+            directory, name = os.path.split(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    output.write(CORPUS_CACHE_MAGIC)
+                    output.write(len(header).to_bytes(8, 'little'))
+                    output.write(header)
+                    for name in CORPUS_CACHE_COLUMNS:
+                        with open(os.path.join(self.work_dir, name), 'rb') as column:
+                            shutil.copyfileobj(column, output)
+                        output.write(b'\0' * (-columns[name][1] % 8))
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        return self.rows
+
+    def discard(self):
+        """Drop the rows written so far without creating the cache"""
+        for file in self.files.values():
+            file.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class CorpusCache(Sequence):
+    """Read-only corpus backed by a memory-mapped cache file.
+
+    Behaves like the list of rows returned by load_corpus_file; each row is
+    decoded from the mapped columns when it is accessed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(CORPUS_CACHE_MAGIC)] != CORPUS_CACHE_MAGIC:
+            self.map.close()
+            raise ValueError(f"{os.path.basename(path)} is not a corpus cache file")
+
+        start = len(CORPUS_CACHE_MAGIC) + 8
+        header_size = int.from_bytes(self.map[len(CORPUS_CACHE_MAGIC):start], 'little')
+        header = json.loads(self.map[start:start + header_size].decode('utf-8'))
+        if header["byteorder"] != sys.byteorder:
+            self.map.close()
+            raise ValueError("The corpus cache was written on a machine with another byte order")
+
+        self.rows = header["rows"]
+        self.cajas = header["cajas"]
+        self.fechas = header["fechas"]
+        data = memoryview(self.map)[start + header_size:]
+        self.columns = {
+            name: data[offset:offset + size].cast(typecode)
+            for name, (offset, size, typecode) in header["columns"].items()
+        }
+        self.caja_codes = self.columns['caja']
+        self.fecha_codes = self.columns['fecha']
+        self.importes = self.columns['importe']
+        self.concepto_offsets = self.columns['concepto_offsets']
+        self.conceptos = self.columns['concepto']
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("corpus index out of range")
+        importe = self.importes[index]
+        return [
+            self.cajas[self.caja_codes[index]],
+            self.fechas[self.fecha_codes[index]],
+            str(self.conceptos[self.concepto_offsets[index]:self.concepto_offsets[index + 1]], 'utf-8'),
+            None if importe != importe else importe,  # NaN marks a missing amount
+        ]
+
+    def caja_fecha(self):
+        """Iterate over the (caja, fecha) of every row"""
+        cajas, fechas = self.cajas, self.fechas
+        for caja, fecha in zip(self.caja_codes, self.fecha_codes):
+            yield cajas[caja], fechas[fecha]
+
+    def close(self):
+        """Release the memory map"""
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        self.map.close()
+
+
+def release_corpus_cache(corpus):
+    """Close a corpus cache, leaving it to the garbage collector if rows are still referenced"""
+    try:
+        corpus.close()
+    except BufferError:
+        pass  # A decoded slice still points into the map; it is unmapped once collected
+
+
+# Regex cost analysis
+#
+# Matchers test regex literals against free-text concepts, some of them long
+# SEPA remittance strings. The analysis extracts every regex literal, flags
+# constructs prone to super-linear backtracking and times each regex in Node.js
+# (the engine that runs them in the app) against the longest and most
+# adversarial concepts.
+
+# A regex taking longer than this on a single input is reported as timed out
+REGEX_TIMEOUT_SECONDS = 5
+
+# Measured worst case above which a regex is underlined in the matcher editor
+REGEX_SLOW_MS = 10.0
+
+# Corpus concepts used as timing inputs: the longest ones and the most repetitive ones
+REGEX_SAMPLE_SIZE = 20
+
+# Length of the synthetic inputs built by repeating a regex's own characters
+REGEX_PUMP_LENGTH = 2000
+
+# Characters a bank concept can contain, used to approximate character sets
+REGEX_UNIVERSE = frozenset(chr(c) for c in range(32, 127)) | frozenset("ÁÉÍÓÚÑÜáéíóúñüºª€")
+REGEX_DIGITS = frozenset("0123456789")
+REGEX_WORD = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+REGEX_SPACE = frozenset(" \t\n\r\f\v")
+
+# Words after which a '/' starts a regex literal rather than a division
+REGEX_PRECEDING_WORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void')
+
+# Node.js regex timer. Usage: node timer.js <job.json>
+# The job holds [source, flags] and the inputs; prints [maxMs, totalMs, worstInput].
+REGEX_TIMER_JS = """
+const fs = require('fs');
+
+const job = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+const regex = new RegExp(job.source, job.flags.replace(/[gy]/g, ''));
+
+let maxMs = 0, totalMs = 0, worst = -1;
+job.inputs.forEach((input, index) => {
+    const start = process.hrtime.bigint();
+    regex.test(input);
+    const elapsed = Number(process.hrtime.bigint() - start) / 1e6;
+    totalMs += elapsed;
+    if (elapsed > maxMs) {
+        maxMs = elapsed;
+        worst = index;
+    }
+});
+process.stdout.write(JSON.stringify([maxMs, totalMs, worst]));
+"""
+
+
+# Multi-character punctuators, longest first
+JS_PUNCTUATORS = ('>>>=', '...', '===', '!==', '**=', '<<=', '>>=', '>>>', '&&=', '||=', '??=',
+                  '=>', '==', '!=', '<=', '>=', '&&', '||', '??', '?.', '++', '--', '+=', '-=', '*=',
+                  '/=', '%=', '&=', '|=', '^=', '<<', '>>', '**')
+
+
+def tokenize_js(code):
+    """Split JavaScript code into (kind, text, start, end) tokens, skipping comments.
+
+    Kinds are 'name', 'number', 'string', 'template', 'regex' and 'punct'. The
+    expressions inside a template literal are tokenized too and follow the
+    template token. Unterminated strings run to the end of the line.
+    """
+    tokens = []
+    i = 0
+    length = len(code)
+    while i < length:
+        char = code[i]
+        if char.isspace():
+            i += 1
+            continue
+        if code.startswith('//', i):
+            end = code.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        if code.startswith('/*', i):
+            end = code.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            continue
+        start = i
+        previous = tokens[-1] if tokens else None
+        if char in '"\'':
+            i += 1
+            while i < length and code[i] != char and code[i] != '\n':
+                i += 2 if code[i] == '\\' else 1
+            i = min(i + 1, length)
+            tokens.append(('string', code[start:i], start, i))
+            continue
+        if char == '`':
+            i += 1
+            expressions = []
+            while i < length and code[i] != '`':
+                if code[i] == '\\':
+                    i += 2
+                    continue
+                if code.startswith('${', i):
+                    depth = 1
+                    j = i + 2
+                    while j < length and depth:
+                        depth += {'{': 1, '}': -1}.get(code[j], 0)
+                        j += 1
+                    expressions.append((i + 2, j - 1))
+                    i = j
+                    continue
+                i += 1
+            i = min(i + 1, length)
+            tokens.append(('template', code[start:i], start, i))
+            for expr_start, expr_end in expressions:
+                tokens.extend((kind, text, a + expr_start, b + expr_start)
+                              for kind, text, a, b in tokenize_js(code[expr_start:expr_end]))
+            continue
+        if char.isalpha() or char in '_$':
+            while i < length and (code[i].isalnum() or code[i] in '_$'):
+                i += 1
+            tokens.append(('name', code[start:i], start, i))
+            continue
+        if char.isdigit() or (char == '.' and i + 1 < length and code[i + 1].isdigit()):
+            match = re.match(r'0[xXoObB][0-9a-fA-F_]+|(\d[\d_]*)?\.?\d*([eE][+-]?\d+)?n?', code[i:])
+            i += max(1, match.end())
+            tokens.append(('number', code[start:i], start, i))
+            continue
+        regex_allowed = previous is None or (previous[0] == 'punct' and previous[1] not in (')', ']', '}')) \
+            or (previous[0] == 'name' and previous[1] in REGEX_PRECEDING_WORDS)
+        if char == '/' and regex_allowed:
+            end = i + 1
+            in_class = False
+            while end < length and code[end] != '\n':
+                if code[end] == '\\':
+                    end += 2
+                    continue
+                if code[end] == '[':
+                    in_class = True
+                elif code[end] == ']':
+                    in_class = False
+                elif code[end] == '/' and not in_class:
+                    break
+                end += 1
+            if end < length and code[end] == '/':
+                i = end + 1
+                while i < length and code[i].isalpha():
+                    i += 1
+                tokens.append(('regex', code[start:i], start, i))
+                continue
+        for punct in JS_PUNCTUATORS:
+            if code.startswith(punct, i):
+                i += len(punct)
+                break
+        else:
+            i += 1
+        tokens.append(('punct', code[start:i], start, i))
+    return tokens
+
+
+def find_regex_literals(code):
+    """Return (start, end, source, flags) for each regex literal in JavaScript code"""
+    literals = []
+    for kind, text, start, end in tokenize_js(code):
+        if kind == 'regex':
+            close = text.rindex('/')
+            literals.append((start, end, text[1:close], text[close + 1:]))
+    return literals
+
+
+def _regex_escape_set(char):
+    """Character set matched by the escape \\<char>"""
+    sets = {
+        'd': REGEX_DIGITS, 'D': REGEX_UNIVERSE - REGEX_DIGITS,
+        'w': REGEX_WORD, 'W': REGEX_UNIVERSE - REGEX_WORD,
+        's': REGEX_SPACE, 'S': REGEX_UNIVERSE - REGEX_SPACE,
+    }
+    if char in sets:
+        return sets[char]
+    controls = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+    return frozenset(controls.get(char, char))
+
+
+def _parse_regex_class(source, i):
+    """Parse a [...] class starting after '['; return (charset, next index)"""
+    negated = source.startswith('^', i)
+    if negated:
+        i += 1
+    chars = set()
+    first = True
+    while i < len(source) and (source[i] != ']' or first):
+        first = False
+        if source[i] == '\\' and i + 1 < len(source):
+            chars |= _regex_escape_set(source[i + 1])
+            i += 2
+            continue
+        if i + 2 < len(source) and source[i + 1] == '-' and source[i + 2] != ']':
+            chars |= {chr(c) for c in range(ord(source[i]), ord(source[i + 2]) + 1)}
+            i += 3
+            continue
+        chars.add(source[i])
+        i += 1
+    charset = REGEX_UNIVERSE - chars if negated else frozenset(chars)
+    return frozenset(charset), i + 1
+
+
+def _parse_regex_quantifier(source, i):
+    """Parse a quantifier at i; return ((min, max or None), next index) or (None, i)"""
+    if i >= len(source):
+        return None, i
+    if source[i] in '*+?':
+        bounds = {'*': (0, None), '+': (1, None), '?': (0, 1)}[source[i]]
+        i += 1
+    else:
+        match = re.match(r'\{(\d+)(,(\d*))?\}', source[i:])
+        if not match:
+            return None, i
+        low = int(match.group(1))
+        high = low if match.group(2) is None else (int(match.group(3)) if match.group(3) else None)
+        bounds = (low, high)
+        i += match.end()
+    if i < len(source) and source[i] == '?':
+        i += 1  # Lazy quantifiers backtrack the same way
+    return bounds, i
+
+
+def _parse_regex_sequence(source, i, ignore_case):
+    """Parse alternatives until ')' or the end; return (alternatives, next index).
+
+    Each alternative is a list of items ``[kind, charset, children, quantifier]``
+    where kind is 'atom', 'group' or 'anchor'.
+    """
+    alternatives = [[]]
+    while i < len(source) and source[i] != ')':
+        char = source[i]
+        if char == '|':
+            alternatives.append([])
+            i += 1
+            continue
+        if char == '(':
+            i += 1
+            if source.startswith('?', i):
+                # (?:...), lookarounds and named groups
+                match = re.match(r'\?(:|=|!|<=|<!|<[^>]+>)', source[i:])
+                i += match.end() if match else 1
+            children, i = _parse_regex_sequence(source, i, ignore_case)
+            i += 1  # Closing paren
+            charset = frozenset().union(*(item[1] for alt in children for item in alt))
+            item = ['group', charset, children, None]
+        elif char == '[':
+            charset, i = _parse_regex_class(source, i + 1)
+            item = ['atom', charset, None, None]
+        elif char == '\\' and i + 1 < len(source):
+            if source[i + 1] in 'bB':
+                item = ['anchor', frozenset(), None, None]
+            else:
+                item = ['atom', _regex_escape_set(source[i + 1]), None, None]
+            i += 2
+        elif char in '^$':
+            item = ['anchor', frozenset(), None, None]
+            i += 1
+        elif char == '.':
+            item = ['atom', REGEX_UNIVERSE, None, None]
+            i += 1
+        else:
+            item = ['atom', frozenset(char), None, None]
+            i += 1
+        if ignore_case and item[0] == 'atom':
+            item[1] = frozenset(item[1]) | {c.swapcase() for c in item[1]}
+        item[3], i = _parse_regex_quantifier(source, i)
+        alternatives[-1].append(item)
+    return alternatives, i
+
+
+def _regex_first_set(sequence):
+    """Characters that can start a match of an item sequence"""
+    first = set()
+    for kind, charset, children, quantifier in sequence:
+        if kind == 'anchor':
+            continue
+        if kind == 'group':
+            for alternative in children:
+                first |= _regex_first_set(alternative)
+        else:
+            first |= charset
+        if not quantifier or quantifier[0] > 0:
+            break
+    return first
+
+
+def _regex_is_unbounded(item):
+    return item[3] is not None and item[3][1] is None
+
+
+def _regex_has_unbounded(alternatives):
+    for alternative in alternatives:
+        for item in alternative:
+            if _regex_is_unbounded(item):
+                return True
+            if item[0] == 'group' and _regex_has_unbounded(item[2]):
+                return True
+    return False
+
+
+def regex_backtracking_warnings(source, flags=''):
+    """Return warnings for constructs in a regex prone to super-linear backtracking.
+
+    Flags nested quantifiers such as ``(a+)+``, quantified alternations whose
+    branches can match the same text such as ``(\\w|\\d)*``, adjacent
+    unbounded quantifiers over overlapping characters such as ``\\s*.*``, and
+    a leading ``.*`` in an unanchored regex.
+    """
+    try:
+        alternatives, _ = _parse_regex_sequence(source, 0, 'i' in flags)
+    except (IndexError, ValueError):
+        return []
+
+    warnings = []
+
+    def walk(sequences):
+        for sequence in sequences:
+            previous = None
+            for item in sequence:
+                kind, charset, children, quantifier = item
+                if kind == 'group':
+                    if _regex_is_unbounded(item) and _regex_has_unbounded(children):
+                        warnings.append("Nested quantifier: a quantified group contains an unbounded quantifier")
+                    if _regex_is_unbounded(item) and len(children) > 1:
+                        firsts = [_regex_first_set(alternative) for alternative in children]
+                        if any(firsts[a] & firsts[b] for a in range(len(firsts)) for b in range(a + 1, len(firsts))):
+                            warnings.append("Overlapping alternation: branches of a repeated group can match the same text")
+                    walk(children)
+                if kind == 'anchor':
+                    previous = None
+                    continue
+                if previous is not None and _regex_is_unbounded(previous) and _regex_is_unbounded(item) \
+                        and previous[1] & charset:
+                    warnings.append("Adjacent quantifiers: consecutive unbounded quantifiers over overlapping characters")
+                if quantifier is None or quantifier[0] > 0 or _regex_is_unbounded(item):
+                    previous = item
+
+    walk(alternatives)
+    for sequence in alternatives:
+        if sequence and sequence[0][0] == 'atom' and _regex_is_unbounded(sequence[0]) \
+                and sequence[0][1] == REGEX_UNIVERSE and len(sequence) > 1:
+            warnings.append("Leading .* without ^: every start position rescans the rest of the concept")
+    # Keep the first occurrence of each kind of warning
+    return list(dict.fromkeys(warnings))
+
+
+def select_adversarial_concepts(concepts, sample_size=REGEX_SAMPLE_SIZE):
+    """Pick the longest concepts and those with the longest runs of one character class"""
+    unique = list({str(c) for c in concepts})
+
+    def longest_run(text):
+        best = run = 0
+        previous = None
+        for char in text:
+            kind = 'd' if char.isdigit() else 'a' if char.isalpha() else char
+            run = run + 1 if kind == previous else 1
+            previous = kind
+            best = max(best, run)
+        return best
+
+    longest = sorted(unique, key=len, reverse=True)[:sample_size]
+    repetitive = sorted(unique, key=longest_run, reverse=True)[:sample_size]
+    return list(dict.fromkeys(longest + repetitive))
+
+
+def regex_pump_inputs(source, flags=''):
+    """Build synthetic inputs repeating the characters of each unbounded quantifier"""
+    try:
+        alternatives, _ = _parse_regex_sequence(source, 0, 'i' in flags)
+    except (IndexError, ValueError):
+        return []
+
+    pumps = []
+
+    def walk(sequences):
+        for sequence in sequences:
+            for item in sequence:
+                if item[0] == 'group':
+                    walk(item[2])
+                if _regex_is_unbounded(item) and item[1]:
+                    # Prefer a readable character, and finish with one that breaks the match
+                    char = min(item[1], key=lambda c: (not c.isalnum(), c))
+                    pumps.append(char * REGEX_PUMP_LENGTH + '\u0000')
+
+    walk(alternatives)
+    return list(dict.fromkeys(pumps))
+
+
+def time_regex(source, flags, inputs, timeout=REGEX_TIMEOUT_SECONDS):
+    """Time a regex in Node.js; return (max_ms, total_ms, worst_input_index, timed_out)"""
+    work_dir = tempfile.mkdtemp(prefix='pattern-regex-')
+    try:
+        script_path = os.path.join(work_dir, 'timer.js')
+        with open(script_path, 'w', encoding='utf-8') as file:
+            file.write(REGEX_TIMER_JS)
+        job_path = os.path.join(work_dir, 'job.json')
+        with open(job_path, 'w', encoding='utf-8') as file:
+            json.dump({"source": source, "flags": flags, "inputs": inputs}, file)
+        try:
+            result = subprocess.run(
+                ["node", script_path, job_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return timeout * 1000.0, timeout * 1000.0, -1, True
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "regex timer failed")
+        max_ms, total_ms, worst = json.loads(result.stdout)
+        return max_ms, total_ms, worst, False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def analyze_pattern_regexes(patterns, sample, workers=None, timeout=REGEX_TIMEOUT_SECONDS):
+    """Extract, statically check and time every regex literal in the matchers.
+
+    ``sample`` holds the corpus concepts used as timing inputs, as selected by
+    select_adversarial_concepts; synthetic inputs are added per regex. Returns a list of dicts ranked by measured cost (timeouts first), each with
+    pattern_index, description, source, flags, warnings, max_ms, total_ms,
+    worst_input, timed_out and error.
+    """
+    jobs = []
+    for index, pattern in enumerate(patterns):
+        for start, end, source, flags in find_regex_literals(pattern.get("matcherFunction", "")):
+            jobs.append({
+                "pattern_index": index,
+                "description": pattern.get("description", f"Pattern {index+1}"),
+                "source": source,
+                "flags": flags,
+                "warnings": regex_backtracking_warnings(source, flags),
+                "max_ms": 0.0,
+                "total_ms": 0.0,
+                "worst_input": None,
+                "timed_out": False,
+                "error": None,
+            })
+
+    def run_job(job):
+        inputs = sample + regex_pump_inputs(job["source"], job["flags"])
+        try:
+            max_ms, total_ms, worst, timed_out = time_regex(job["source"], job["flags"], inputs, timeout)
+        except Exception as e:
+            job["error"] = str(e)
+            return
+        job.update(max_ms=max_ms, total_ms=total_ms, timed_out=timed_out,
+                   worst_input=inputs[worst] if worst >= 0 else None)
+
+    with ThreadPoolExecutor(max_workers=workers or default_worker_count()) as pool:
+        list(pool.map(run_job, jobs))
+
+    jobs.sort(key=lambda job: (not job["timed_out"], -job["max_ms"], -len(job["warnings"])))
+    return jobs
+
+
+# Generator change preview
+#
+# Runs the saved and the edited generator over every corpus movement the
+# pattern matches and diffs the normalized outputs. The diff is computed in
+# the Node.js workers, so only the changes travel back to the editor.
+
+# Fields that change on every run and are removed before diffing
+GENERATOR_VOLATILE_FIELDS = ('creation_date',)
+
+# Rows shown per page in the preview
+PREVIEW_PAGE_SIZE = 200
+
+# Shard script: job holds matcher, oldGenerator, newGenerator and volatile.
+# Emits 0 for rows the matcher rejects, the error message for rows where it
+# throws, otherwise [changes, partidas] where
+# changes is a list of [kind, path, old, new] and partidas maps each partida
+# to its [old, new] total amount.
+GENERATOR_DIFF_JS = JS_SHARD_PREAMBLE + """
+const matcher = compile(job.matcher);
+const oldGenerator = compile(job.oldGenerator);
+const newGenerator = compile(job.newGenerator);
+const volatile = new Set(job.volatile);
+
+function generate(generator, rawData) {
+    if (!generator) return { __error__: 'Generator does not compile' };
+    try {
+        return generator(rawData);
+    } catch (e) {
+        return { __error__: e.message };
+    }
+}
+
+function flatten(value, path, out) {
+    if (value !== null && typeof value === 'object') {
+        const keys = Object.keys(value).filter(key => Array.isArray(value) || !volatile.has(key));
+        if (!keys.length) {
+            out[path] = Array.isArray(value) ? '[]' : '{}';
+        }
+        keys.forEach(key => {
+            const child = Array.isArray(value) ? path + '[' + key + ']' : (path ? path + '.' + key : key);
+            flatten(value[key], child, out);
+        });
+    } else {
+        out[path] = value === undefined ? null : value;
+    }
+    return out;
+}
+
+function partidaTotals(result, totals, side) {
+    const operaciones = result && Array.isArray(result.operaciones) ? result.operaciones : [];
+    const add = (partida, amount) => {
+        totals[partida] = totals[partida] || [0, 0];
+        totals[partida][side] += Number(amount) || 0;
+    };
+    operaciones.forEach(operacion => {
+        const detalle = (operacion && operacion.detalle) || {};
+        (Array.isArray(detalle.final) ? detalle.final : []).forEach(linea => {
+            if (linea && linea.partida !== undefined && linea.partida !== 'Total') {
+                add(String(linea.partida), linea.IMPORTE_PARTIDA);
+            }
+        });
+        (Array.isArray(detalle.aplicaciones) ? detalle.aplicaciones : []).forEach(aplicacion => {
+            if (aplicacion) {
+                add(aplicacion.funcional + '.' + aplicacion.economica, aplicacion.importe);
+            }
+        });
+    });
+    return totals;
+}
+
+for (const row of rows) {
+    const rawData = rawRow(row);
+    let matches = false;
+    try {
+        matches = matcher !== null && Boolean(matcher(rawData));
+    } catch (e) {
+        emit(String(e && e.message !== undefined ? e.message : e));
+        continue;
+    }
+    if (!matches) {
+        emit(0);
+        continue;
+    }
+
+    const oldResult = generate(oldGenerator, rawData);
+    const newResult = generate(newGenerator, rawData);
+    const oldFlat = flatten(oldResult, '', {});
+    const newFlat = flatten(newResult, '', {});
+
+    const changes = [];
+    Object.keys(oldFlat).forEach(path => {
+        if (!(path in newFlat)) {
+            changes.push(['removed', path, oldFlat[path], null]);
+        } else if (oldFlat[path] !== newFlat[path]) {
+            changes.push(['changed', path, oldFlat[path], newFlat[path]]);
+        }
+    });
+    Object.keys(newFlat).forEach(path => {
+        if (!(path in oldFlat)) {
+            changes.push(['added', path, null, newFlat[path]]);
+        }
+    });
+
+    const totals = partidaTotals(newResult, partidaTotals(oldResult, {}, 0), 1);
+    emit([changes, totals]);
+}
+flush();
+"""
+
+
+def preview_generator_change(matcher, old_generator, new_generator, rows, workers=None, progress=None):
+    """Diff the outputs of two generators over the corpus movements a matcher accepts.
+
+    Returns a dict with:
+      matched: corpus indices of the matched movements
+      errors: {corpus index: message} for rows where the matcher throws
+      changed: {corpus index: [(kind, path, old, new), ...]} for rows whose output changed
+      groups: {(kind, path): [count, first old, first new]}
+      partidas: {partida: [old total, new total]}
+    """
+    preview = {"matched": [], "errors": {}, "changed": {}, "groups": {}, "partidas": {}}
+    lock = threading.Lock()
+
+    def merge(indices, entries):
+        with lock:
+            for index, entry in zip(indices, entries):
+                if entry == 0:
+                    continue
+                if isinstance(entry, str):
+                    preview["errors"][index] = entry
+                    continue
+                changes, totals = entry
+                preview["matched"].append(index)
+                if changes:
+                    preview["changed"][index] = [tuple(change) for change in changes]
+                for kind, path, old, new in changes:
+                    group = preview["groups"].setdefault((kind, path), [0, old, new])
+                    group[0] += 1
+                for partida, (old_total, new_total) in totals.items():
+                    partida_totals = preview["partidas"].setdefault(partida, [0.0, 0.0])
+                    partida_totals[0] += old_total
+                    partida_totals[1] += new_total
+
+    if rows:
+        job = {
+            "matcher": matcher,
+            "oldGenerator": old_generator,
+            "newGenerator": new_generator,
+            "volatile": list(GENERATOR_VOLATILE_FIELDS),
+        }
+        run_corpus_shards(GENERATOR_DIFF_JS, job, rows, merge, workers=workers, progress=progress)
+
+    preview["matched"].sort()
+    return preview
+
+
+# Live code checking
+#
+# Matcher and generator code is checked while typing: syntax by a persistent
+# Node.js process that compiles the code, semantics (undefined names, data
+# destructuring, generator result fields) from the token stream. Results are
+# cached by content hash, so unchanged code is never checked twice.
+
+# Pause in typing after which the code is checked
+CHECK_PAUSE_MS = 30
+
+# Longest wait for the Node.js syntax check; a slower answer is retried on the next pause
+CHECK_TIMEOUT_SECONDS = 0.02
+
+# Checked snippets kept in the cache
+CHECK_CACHE_SIZE = 512
+
+# The fields of a movement, in the order matchers and generators receive them
+DATA_FIELDS = ('caja', 'fecha', 'concepto', 'importe')
+
+# Fields every generator result needs (see saveAccountingTasks in database.js)
+REQUIRED_GENERATOR_FIELDS = ('id_task', 'operaciones')
+
+# Helper functions provided to pattern code
+PATTERN_HELPERS = tuple(re.findall(r'function (\w+)\(', JS_HELPERS))
+
+JS_KEYWORDS = frozenset((
+    'const', 'let', 'var', 'function', 'return', 'if', 'else', 'for', 'while', 'do', 'switch',
+    'case', 'default', 'break', 'continue', 'try', 'catch', 'finally', 'throw', 'new', 'delete',
+    'typeof', 'instanceof', 'void', 'this', 'null', 'undefined', 'true', 'false', 'in', 'of',
+    'class', 'extends', 'super', 'await', 'async', 'yield', 'with', 'debugger',
+))
+
+JS_GLOBALS = frozenset((
+    'Math', 'Number', 'String', 'Boolean', 'Array', 'Object', 'Date', 'JSON', 'RegExp', 'Map',
+    'Set', 'Symbol', 'BigInt', 'Promise', 'Error', 'TypeError', 'RangeError', 'Intl', 'console',
+    'parseFloat', 'parseInt', 'isNaN', 'isFinite', 'encodeURIComponent', 'decodeURIComponent',
+    'NaN', 'Infinity', 'globalThis', 'arguments',
+))
+
+# Persistent syntax checker. Reads one JSON [id, code] per line and answers
+# [id, null] or [id, [message, line, column]] with 1-based positions in the code.
+CODE_CHECKER_JS = """
+const vm = require('vm');
+const readline = require('readline');
+
+// Compiled the way bank-translator.js loads patterns: new Function('return ' + code)
+const PREFIX = '(function () { return ';
+
+readline.createInterface({ input: process.stdin }).on('line', line => {
+    const [id, code] = JSON.parse(line);
+    let error = null;
+    try {
+        new vm.Script(PREFIX + code + '\\n})', { filename: 'pattern.js' });
+    } catch (e) {
+        const stack = String(e.stack).split('\\n');
+        const position = /:(\\d+)$/.exec(stack[0]);
+        const lineNumber = position ? parseInt(position[1], 10) : 1;
+        const caret = stack[2] ? stack[2].indexOf('^') : -1;
+        // The prefix shifts the first line
+        const column = caret < 0 ? 1 : (lineNumber === 1 ? caret - PREFIX.length + 1 : caret + 1);
+        error = [e.message, lineNumber, Math.max(column, 1)];
+    }
+    process.stdout.write(JSON.stringify([id, error]) + '\\n');
+});
+"""
+
+
+def _matching_index(tokens, index, opening, closing):
+    """Index of the token closing the bracket at tokens[index], or len(tokens)"""
+    depth = 0
+    for i in range(index, len(tokens)):
+        if tokens[i][0] == 'punct':
+            if tokens[i][1] == opening:
+                depth += 1
+            elif tokens[i][1] == closing:
+                depth -= 1
+                if depth == 0:
+                    return i
+    return len(tokens)
+
+
+def _declared_names(tokens):
+    """Names declared anywhere in the code (variables, functions, parameters)"""
+    declared = set()
+    for i, (kind, text, start, end) in enumerate(tokens):
+        if kind == 'name' and text in ('const', 'let', 'var'):
+            # Names and destructuring patterns separated by ',', each with an
+            # optional initializer that is skipped up to the next ','
+            depth = 0
+            initializer = False
+            for kind2, text2, _, _ in tokens[i + 1:]:
+                if kind2 == 'punct' and text2 in '([{':
+                    depth += 1
+                elif kind2 == 'punct' and text2 in ')]}':
+                    depth -= 1
+                    if depth < 0:
+                        break  # End of a for (...) header or of the enclosing block
+                elif depth == 0:
+                    if text2 == ';' or not initializer and text2 in ('of', 'in'):
+                        break
+                    if text2 == ',':
+                        initializer = False
+                        continue
+                    if text2 == '=':
+                        initializer = True
+                    elif not initializer and kind2 != 'name':
+                        break
+                if kind2 == 'name' and not initializer:
+                    declared.add(text2)
+        elif kind == 'name' and text in ('function', 'class', 'catch'):
+            j = i + 1
+            if j < len(tokens) and tokens[j][0] == 'name':
+                declared.add(tokens[j][1])
+                j += 1
+            if j < len(tokens) and tokens[j][1] == '(' and text != 'class':
+                close = _matching_index(tokens, j, '(', ')')
+                declared.update(t[1] for t in tokens[j + 1:close] if t[0] == 'name')
+        elif kind == 'punct' and text == '=>' and i > 0:
+            if tokens[i - 1][0] == 'name':
+                declared.add(tokens[i - 1][1])
+            elif tokens[i - 1][1] == ')':
+                # Walk back to the opening paren of the parameter list
+                depth = 0
+                for j in range(i - 1, -1, -1):
+                    if tokens[j][1] == ')':
+                        depth += 1
+                    elif tokens[j][1] == '(':
+                        depth -= 1
+                        if depth == 0:
+                            break
+                    elif tokens[j][0] == 'name':
+                        declared.add(tokens[j][1])
+    return declared
+
+
+def _object_keys(tokens, index):
+    """Top-level keys of the object literal opening at tokens[index]; None if it spreads"""
+    keys = set()
+    close = _matching_index(tokens, index, '{', '}')
+    depth = 0
+    for i in range(index + 1, close):
+        kind, text = tokens[i][0], tokens[i][1]
+        if kind == 'punct' and text in '([{':
+            depth += 1
+        elif kind == 'punct' and text in ')]}':
+            depth -= 1
+        elif depth == 0:
+            if text == '...':
+                return None
+            after = tokens[i + 1][1] if i + 1 < close else '}'
+            before = tokens[i - 1][1]
+            if kind in ('name', 'string') and before in ('{', ',') and after in (':', ',', '}', '('):
+                keys.add(text.strip('\'"'))
+    return keys
+
+
+def check_js_semantics(code, kind):
+    """Return (severity, start, end, message) diagnostics for matcher or generator code.
+
+    Reports names that are neither declared in the code nor JavaScript globals
+    or pattern helpers, destructuring of the movement that does not follow
+    [caja, fecha, concepto, importe], and, for generators, returned objects
+    missing id_task or operaciones.
+    """
+    tokens = tokenize_js(code)
+    diagnostics = []
+    if not tokens:
+        return diagnostics
+
+    # Undefined names
+    known = _declared_names(tokens) | JS_KEYWORDS | JS_GLOBALS | set(PATTERN_HELPERS)
+    for i, (token_kind, text, start, end) in enumerate(tokens):
+        if token_kind != 'name' or text in known:
+            continue
+        before = tokens[i - 1][1] if i > 0 else ''
+        after = tokens[i + 1][1] if i + 1 < len(tokens) else ''
+        if before in ('.', '?.'):
+            continue  # Property access
+        if after == ':' and before in ('{', ','):
+            continue  # Object key
+        if after == ':' and before in ('', ';', '}') or before in ('break', 'continue'):
+            continue  # Statement label
+        if after == '(':
+            message = f"Undefined helper '{text}': not declared and not one of {', '.join(PATTERN_HELPERS)}"
+        else:
+            message = f"Undefined variable '{text}'"
+        diagnostics.append(('warning', start, end, message))
+
+    # Destructuring of the movement parameter
+    param = None
+    if tokens[0][1] == '(' and len(tokens) > 1 and tokens[1][0] == 'name':
+        param = tokens[1][1]
+    elif tokens[0][0] == 'name' and len(tokens) > 1 and tokens[1][1] == '=>':
+        param = tokens[0][1]
+    elif tokens[0][1] == 'function':
+        open_paren = next((i for i, token in enumerate(tokens) if token[1] == '('), None)
+        if open_paren is not None and open_paren + 1 < len(tokens) and tokens[open_paren + 1][0] == 'name':
+            param = tokens[open_paren + 1][1]
+    for i, (token_kind, text, start, end) in enumerate(tokens):
+        if text != '[' or i == 0 or tokens[i - 1][1] not in ('const', 'let', 'var'):
+            continue
+        close = _matching_index(tokens, i, '[', ']')
+        if close + 2 >= len(tokens) or tokens[close + 1][1] != '=' or tokens[close + 2][1] != param:
+            continue
+        elements = [[]]
+        for token in tokens[i + 1:close]:
+            if token[1] == ',':
+                elements.append([])
+            else:
+                elements[-1].append(token[1])
+        if elements[-1] == []:
+            elements.pop()  # Trailing comma
+        if any(element[:1] == ['...'] for element in elements):
+            continue
+        names = [element[0] if element else '' for element in elements]
+        if len(names) != len(DATA_FIELDS):
+            diagnostics.append(('warning', tokens[i][2], tokens[close][3],
+                                f"Destructures {len(names)} values from {param}, a movement has "
+                                f"{len(DATA_FIELDS)}: [{', '.join(DATA_FIELDS)}]"))
+        else:
+            misplaced = [name for position, name in enumerate(names)
+                         if name in DATA_FIELDS and DATA_FIELDS.index(name) != position]
+            if misplaced:
+                diagnostics.append(('warning', tokens[i][2], tokens[close][3],
+                                    f"{', '.join(misplaced)} out of place, a movement is "
+                                    f"[{', '.join(DATA_FIELDS)}]"))
+
+    # Fields of the generator result
+    if kind == 'generator':
+        function_braces = []  # One entry per open brace: True if it opens a function body
+        for i, (token_kind, text, start, end) in enumerate(tokens):
+            if text == '{' and token_kind == 'punct':
+                previous = tokens[i - 1][1] if i > 0 else ''
+                is_function = previous == '=>'
+                if previous == ')':
+                    depth = 0
+                    for j in range(i - 1, -1, -1):
+                        if tokens[j][1] == ')':
+                            depth += 1
+                        elif tokens[j][1] == '(':
+                            depth -= 1
+                            if depth == 0:
+                                break
+                    keyword = tokens[j - 1][1] if j > 0 else ''
+                    is_function = keyword not in ('if', 'for', 'while', 'switch', 'catch', 'with')
+                function_braces.append(is_function)
+            elif text == '}' and token_kind == 'punct' and function_braces:
+                function_braces.pop()
+            elif text == 'return' and token_kind == 'name' and function_braces.count(True) == 1 \
+                    and i + 1 < len(tokens) and tokens[i + 1][1] == '{':
+                keys = _object_keys(tokens, i + 1)
+                if keys is None:
+                    continue
+                missing = [field for field in REQUIRED_GENERATOR_FIELDS if field not in keys]
+                if missing:
+                    diagnostics.append(('warning', start, end,
+                                        f"Generator result is missing {', '.join(missing)}"))
+
+    return diagnostics
+
+
+class JSCodeChecker:
+    """Checks matcher and generator code, caching the diagnostics by content hash.
+
+    Syntax errors come from a persistent Node.js process (started on first use)
+    that compiles the code; semantic warnings from check_js_semantics.
+    """
+
+    def __init__(self, node_available=True, cache_size=CHECK_CACHE_SIZE):
+        self.node_available = node_available
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.process = None
+        self.script_path = None
+        self.responses = queue.Queue()
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        # Launch the Node.js worker and a thread forwarding its answers
+        fd, self.script_path = tempfile.mkstemp(prefix='pattern-checker-', suffix='.js')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(CODE_CHECKER_JS)
+        self.process = subprocess.Popen(
+            ["node", self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+
+        def forward(stdout):
+            for line in stdout:
+                self.responses.put(json.loads(line))
+
+        threading.Thread(target=forward, args=(self.process.stdout,), daemon=True).start()
+
+    def close(self):
+        """Stop the Node.js worker"""
+        if self.process:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+            self.process = None
+        if self.script_path:
+            try:
+                os.unlink(self.script_path)
+            except OSError:
+                pass
+            self.script_path = None
+
+    def check_syntax(self, code, timeout):
+        """Return (error or None, answered) where error is (message, line, column)"""
+        if not self.node_available:
+            return None, True
+        with self.lock:
+            try:
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+                self.next_id += 1
+                request_id = self.next_id
+                self.process.stdin.write(json.dumps([request_id, code]) + '\n')
+                self.process.stdin.flush()
+            except OSError:
+                self.node_available = False
+                return None, True
+
+            deadline = time.perf_counter() + timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                try:
+                    answer_id, error = self.responses.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    return None, False
+                if answer_id == request_id:
+                    return error, True
+                # Answers to requests that timed out earlier are dropped
+
+    def check(self, code, kind, timeout=CHECK_TIMEOUT_SECONDS):
+        """Return (diagnostics, complete) for the code.
+
+        Diagnostics are (severity, start, end, message) tuples with character
+        offsets. complete is False when the syntax check did not answer in
+        time; such results are not cached.
+        """
+        key = (kind, hashlib.sha1(code.encode('utf-8')).hexdigest())
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key], True
+
+        diagnostics = []
+        error, complete = self.check_syntax(code, timeout)
+        if error:
+            message, line, column = error
+            lines = code.split('\n')
+            line = min(max(line, 1), len(lines))
+            offset = sum(len(text) + 1 for text in lines[:line - 1]) + min(column - 1, len(lines[line - 1]))
+            diagnostics.append(('error', offset, max(offset + 1, offset + len(lines[line - 1]) - column + 1),
+                                f"Syntax error: {message}"))
+        diagnostics.extend(check_js_semantics(code, kind))
+
+        if complete:
+            self.cache[key] = diagnostics
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return diagnostics, complete
+
+
+# Usage statistics
+#
+# Every movement the app contabilizes stores a 'summary' row in
+# accounting_tasks whose task_data holds the generator output together with
+# the pattern that produced it (pattern_id, pattern_description). matchCount
+# and lastUsed are aggregated from those rows in one GROUP BY, run entirely
+# inside SQLite.
+
+# Default location of the app database (see main.js)
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'prueba05.sqlite')
+
+USAGE_STATS_SQL = """
+SELECT json_extract(task_data, '$.pattern_description') AS pattern_description,
+       json_extract(task_data, '$.pattern_id') AS pattern_id,
+       COUNT(*) AS match_count,
+       MAX(creation_date) AS last_used
+FROM accounting_tasks
+WHERE task_type = 'summary'
+GROUP BY json_extract(task_data, '$.pattern_description'), json_extract(task_data, '$.pattern_id')
+"""
+
+# Index for USAGE_STATS_SQL. Where SQLite can use it as a covering index the
+# query is answered from the index alone; otherwise it only finds the summary
+# rows, and task_data is still read and parsed for each of them.
+USAGE_STATS_INDEXES = (
+    ("idx_accounting_tasks_pattern_usage",
+     "CREATE INDEX IF NOT EXISTS idx_accounting_tasks_pattern_usage ON accounting_tasks"
+     "(task_type, json_extract(task_data, '$.pattern_description'), json_extract(task_data, '$.pattern_id'),"
+     " creation_date)"),
+)
+
+# First SQLite release whose query planner can answer a GROUP BY from an index
+# on an expression; older releases never use USAGE_STATS_INDEXES as covering
+USAGE_STATS_COVERING_VERSION = (3, 41, 0)
+
+
+def query_usage_stats(db_path):
+    """Aggregate usage per pattern from the app database.
+
+    Returns (stats, missing_indexes, covered) where stats maps each
+    (description, pattern_id) pair (None for tasks saved without them) to
+    (match_count, last_used), missing_indexes lists the CREATE INDEX statements of the
+    indexes the query does not use, and covered tells whether the query was
+    answered from a covering index without reading task_data.
+    """
+    uri = 'file:' + os.path.abspath(db_path).replace('\\', '/') + '?mode=ro'
+    connection = sqlite3.connect(uri, uri=True)
+    try:
+        plan = " ".join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + USAGE_STATS_SQL))
+        missing_indexes = [sql for name, sql in USAGE_STATS_INDEXES if name not in plan]
+        covered = any(f"COVERING INDEX {name}" in plan for name, _ in USAGE_STATS_INDEXES)
+        stats = {
+            (description, pattern_id): (match_count, last_used)
+            for description, pattern_id, match_count, last_used in connection.execute(USAGE_STATS_SQL)
+        }
+    finally:
+        connection.close()
+    return stats, missing_indexes, covered
+
+
+def usage_index_can_cover():
+    """Whether this SQLite can answer USAGE_STATS_SQL from USAGE_STATS_INDEXES alone"""
+    return sqlite3.sqlite_version_info >= USAGE_STATS_COVERING_VERSION
+
+
+def create_usage_indexes(db_path, statements):
+    """Create the suggested indexes in the app database"""
+    connection = sqlite3.connect(db_path)
+    try:
+        for statement in statements:
+            connection.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _merge_usage(first, second):
+    """Combine two (match_count, last_used) pairs"""
+    dates = [date for date in (first[1], second[1]) if date is not None]
+    return first[0] + second[0], max(dates, default=None)
+
+
+def apply_usage_stats(patterns, stats):
+    """Set matchCount and lastUsed of each pattern; return the number of patterns used.
+
+    Tasks are matched to patterns by description; patterns sharing a
+    description share its statistics. Tasks whose description no pattern has
+    any more (the pattern was renamed) fall back to their pattern_id, the
+    position "pattern_<n>" of the pattern in the file when the task was saved,
+    so they are misattributed if patterns were reordered since.
+    """
+    descriptions = {pattern.get("description") for pattern in patterns}
+    by_description = {}
+    by_id = {}
+    for (description, pattern_id), usage in stats.items():
+        if description in descriptions:
+            by_description[description] = _merge_usage(by_description.get(description, (0, None)), usage)
+        elif description is not None and pattern_id:
+            by_id[pattern_id] = _merge_usage(by_id.get(pattern_id, (0, None)), usage)
+
+    used = 0
+    for index, pattern in enumerate(patterns):
+        match_count, last_used = _merge_usage(by_description.get(pattern.get("description"), (0, None)),
+                                              by_id.get(f"pattern_{index}", (0, None)))
+        pattern["matchCount"] = match_count
+        pattern["lastUsed"] = last_used
+        if match_count:
+            used += 1
+    return used
+
 
 class TransactionPatternEditor:
     def __init__(self, root):
@@ -133,6 +2194,17 @@ class TransactionPatternEditor:
         self.patterns = []
         self.current_pattern_index = None
         self.file_path = None
+        self.corpus = []
+        self.corpus_lock = threading.Lock()
+        self.corpus_jobs = {}  # Corpus cache -> number of background jobs reading it
+        self.retired_corpora = set()  # Replaced corpus caches waiting for their jobs to finish
+        self.corpus_results = None
+        self.db_path = DEFAULT_DATABASE_PATH if os.path.exists(DEFAULT_DATABASE_PATH) else None
+        self.sort_by_usage = tk.BooleanVar(value=False)
+        self.list_order = []  # Pattern index shown at each listbox position
+        
+        # Shared by the matcher and generator editors; enabled once Node.js is found
+        self.code_checker = JSCodeChecker(node_available=False)
         
         # Create main frames
         self.create_menu()
@@ -152,6 +2224,14 @@ class TransactionPatternEditor:
                 "Node.js was not found on your system. Pattern testing will be limited. "
                 "Install Node.js to enable full testing capabilities."
             )
+        self.code_checker.node_available = self.node_available
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+    def on_close(self):
+        """Stop the code checker's Node.js worker and close the editor"""
+        self.code_checker.close()
+        self.root.destroy()
         
     def check_node_installed(self):
         try:
@@ -174,7 +2254,7 @@ class TransactionPatternEditor:
         filemenu.add_command(label="Save", command=self.save_file)
         filemenu.add_command(label="Save As", command=self.save_as_file)
         filemenu.add_separator()
-        filemenu.add_command(label="Exit", command=self.root.quit)
+        filemenu.add_command(label="Exit", command=self.on_close)
         
         menubar.add_cascade(label="File", menu=filemenu)
         
@@ -185,9 +2265,25 @@ class TransactionPatternEditor:
         patternmenu.add_command(label="Duplicate Pattern", command=self.duplicate_pattern)
         patternmenu.add_separator()
         patternmenu.add_command(label="Test Pattern", command=self.test_pattern)
+        patternmenu.add_command(label="Preview Generator Change", command=self.preview_generator)
+        patternmenu.add_command(label="Analyze Regex Cost", command=self.analyze_regex_cost)
+        patternmenu.add_separator()
+        patternmenu.add_command(label="Refresh Usage Stats", command=self.refresh_usage_stats)
+        patternmenu.add_checkbutton(label="Sort by Usage", variable=self.sort_by_usage,
+                                    command=self.update_pattern_list)
         
         menubar.add_cascade(label="Pattern", menu=patternmenu)
         
+        # Corpus menu
+        corpusmenu = tk.Menu(menubar, tearoff=0)
+        corpusmenu.add_command(label="Load Corpus...", command=self.load_corpus)
+        corpusmenu.add_command(label="Import Bank Exports...", command=self.import_bank_exports)
+        corpusmenu.add_command(label="Evaluate Corpus", command=self.evaluate_corpus)
+        corpusmenu.add_separator()
+        corpusmenu.add_command(label="Benchmark Evaluation", command=self.benchmark_corpus)
+        
+        menubar.add_cascade(label="Corpus", menu=corpusmenu)
+        
         # Help menu
         helpmenu = tk.Menu(menubar, tearoff=0)
         helpmenu.add_command(label="About", command=self.show_about)
@@ -254,7 +2350,14 @@ class TransactionPatternEditor:
         # self.matcher_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         # WITH:
-        self.matcher_text = SimpleJSEditor(matcher_frame, wrap=tk.WORD, width=80, height=15)
+        self.matcher_problems = ttk.Label(matcher_frame, text="", anchor=tk.W)
+        self.matcher_problems.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.matcher_text = SimpleJSEditor(
+            matcher_frame, wrap=tk.WORD, width=80, height=15, check_regex=True,
+            on_warning=lambda message: self.status_label.config(text=message),
+            checker=self.code_checker, check_kind='matcher',
+            on_diagnostics=lambda diagnostics: self.show_problems(self.matcher_problems, diagnostics)
+        )
         self.matcher_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         
@@ -266,7 +2369,14 @@ class TransactionPatternEditor:
         # self.generator_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         # WITH:
-        self.generator_text = SimpleJSEditor(generator_frame, wrap=tk.WORD, width=80, height=15)
+        self.generator_problems = ttk.Label(generator_frame, text="", anchor=tk.W)
+        self.generator_problems.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.generator_text = SimpleJSEditor(
+            generator_frame, wrap=tk.WORD, width=80, height=15,
+            on_warning=lambda message: self.status_label.config(text=message),
+            checker=self.code_checker, check_kind='generator',
+            on_diagnostics=lambda diagnostics: self.show_problems(self.generator_problems, diagnostics)
+        )
         self.generator_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         
@@ -286,6 +2396,9 @@ class TransactionPatternEditor:
         test_btn = ttk.Button(action_frame, text="Test Pattern", command=self.test_pattern)
         test_btn.pack(side=tk.LEFT, padx=5)
         
+        preview_btn = ttk.Button(action_frame, text="Preview Generator Change", command=self.preview_generator)
+        preview_btn.pack(side=tk.LEFT, padx=5)
+        
         update_btn = ttk.Button(action_frame, text="Update Pattern", command=self.update_pattern)
         update_btn.pack(side=tk.LEFT, padx=5)
         
@@ -378,11 +2491,34 @@ class TransactionPatternEditor:
     def update_pattern_list(self):
         self.pattern_listbox.delete(0, tk.END)
         
-        for i, pattern in enumerate(self.patterns):
+        # The order of self.patterns decides which pattern matches first, so
+        # sorting only changes the order they are listed in
+        self.list_order = list(range(len(self.patterns)))
+        if self.sort_by_usage.get():
+            self.list_order.sort(key=lambda i: (
+                not self.patterns[i].get("isFavorite"),
+                -(self.patterns[i].get("matchCount") or 0),
+                i
+            ))
+        
+        for i in self.list_order:
+            pattern = self.patterns[i]
             # Use the description field if available
             description = pattern.get("description", f"Pattern {i+1}")
+            if pattern.get("isFavorite"):
+                description = "★ " + description
+            if pattern.get("matchCount"):
+                description += f"  [{pattern['matchCount']}]"
             self.pattern_listbox.insert(tk.END, description)
     
+    def select_pattern(self, index):
+        """Select the pattern at index in self.patterns and show it"""
+        position = self.list_order.index(index)
+        self.pattern_listbox.selection_clear(0, tk.END)
+        self.pattern_listbox.selection_set(position)
+        self.pattern_listbox.see(position)
+        self.on_pattern_select(None)
+    
     def on_pattern_select(self, event):
         if not self.patterns:
             return
@@ -391,7 +2527,7 @@ class TransactionPatternEditor:
         if not selection:
             return
             
-        index = selection[0]
+        index = self.list_order[selection[0]]
         self.current_pattern_index = index
         pattern = self.patterns[index]
         
@@ -405,11 +2541,24 @@ class TransactionPatternEditor:
         # When setting text (example from on_pattern_select):
         self.matcher_text.delete("1.0", "end")
         self.matcher_text.insert("1.0", pattern.get("matcherFunction", ""))
+        self.matcher_text.mark_regex_warnings()
+        self.matcher_text.schedule_check()
         
         #self.generator_text.delete(1.0, tk.END)
         #self.generator_text.insert(tk.END, pattern.get("generatorFunction", ""))
         self.generator_text.delete("1.0", "end")
         self.generator_text.insert("1.0", pattern.get("generatorFunction", ""))
+        self.generator_text.schedule_check()
+    
+    def show_problems(self, label, diagnostics):
+        """Summarize the problems found in an editor below it"""
+        if not diagnostics:
+            label.config(text="✓ No problems found", foreground='#008000')
+            return
+        first = diagnostics[0][3]
+        more = f" (+{len(diagnostics) - 1} more)" if len(diagnostics) > 1 else ""
+        color = '#B22222' if any(d[0] == 'error' for d in diagnostics) else '#B8860B'
+        label.config(text=f"⚠ {first}{more}", foreground=color)
     
     def update_pattern(self):
         if self.current_pattern_index is None:
@@ -430,7 +2579,7 @@ class TransactionPatternEditor:
         
         # Update the listbox item
         self.update_pattern_list()
-        self.pattern_listbox.selection_set(self.current_pattern_index)
+        self.pattern_listbox.selection_set(self.list_order.index(self.current_pattern_index))
         
         self.status_label.config(text="Pattern updated")
     
@@ -454,10 +2603,7 @@ class TransactionPatternEditor:
         self.update_pattern_list()
         
         # Select the new pattern
-        new_index = len(self.patterns) - 1
-        self.pattern_listbox.selection_clear(0, tk.END)
-        self.pattern_listbox.selection_set(new_index)
-        self.on_pattern_select(None)
+        self.select_pattern(len(self.patterns) - 1)
         
         self.status_label.config(text="Pattern duplicated")
 
@@ -484,6 +2630,7 @@ class TransactionPatternEditor:
   const importeNumerico = parseFloat(importe);
   
   return {
+    id_task: caja + '_' + fecha + '_' + String(importe),
     num_operaciones: 1,
     liquido_operaciones: importeNumerico,
     operaciones: [
@@ -507,17 +2654,15 @@ class TransactionPatternEditor:
         }
       }
     ]
-  };"""
+  };
+}"""
         }
         
         self.patterns.append(new_pattern)
         self.update_pattern_list()
         
         # Select the new pattern
-        new_index = len(self.patterns) - 1
-        self.pattern_listbox.selection_clear(0, tk.END)
-        self.pattern_listbox.selection_set(new_index)
-        self.on_pattern_select(None)
+        self.select_pattern(len(self.patterns) - 1)
         
         self.status_label.config(text="New pattern created")
     
@@ -776,6 +2921,673 @@ console.log(JSON.stringify({{
         # Run initial test automatically
         execute_test()
     
+    def load_corpus(self):
+        """Load bank movements used to evaluate all patterns at once"""
+        file_path = filedialog.askopenfilename(
+            title="Open Test Corpus",
+            filetypes=[("Corpus files", "*.corpus *.json *.csv"), ("All files", "*.*")]
+        )
+
+        if not file_path:
+            return
+
+        try:
+            self.set_corpus(load_corpus_file(file_path))
+            self.status_label.config(text=f"Corpus loaded: {len(self.corpus)} movements from {os.path.basename(file_path)}")
+        except json.JSONDecodeError:
+            messagebox.showerror("Error", "Invalid JSON corpus file")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error loading corpus: {str(e)}")
+
+    def set_corpus(self, corpus):
+        """Replace the corpus, releasing the memory map of a previous corpus cache.
+
+        A cache that background jobs are still reading is released when the
+        last of them finishes.
+        """
+        with self.corpus_lock:
+            previous, self.corpus = self.corpus, corpus
+            if not isinstance(previous, CorpusCache) or previous is corpus:
+                return
+            if self.corpus_jobs.get(previous):
+                self.retired_corpora.add(previous)
+                return
+        release_corpus_cache(previous)
+
+    def acquire_corpus(self, corpus):
+        """Keep the corpus mapped while a background job reads it"""
+        if isinstance(corpus, CorpusCache):
+            with self.corpus_lock:
+                self.corpus_jobs[corpus] = self.corpus_jobs.get(corpus, 0) + 1
+
+    def release_corpus(self, corpus):
+        """Called from the background job when it no longer reads the corpus"""
+        if not isinstance(corpus, CorpusCache):
+            return
+        with self.corpus_lock:
+            self.corpus_jobs[corpus] -= 1
+            if self.corpus_jobs[corpus]:
+                return
+            del self.corpus_jobs[corpus]
+            if corpus not in self.retired_corpora:
+                return
+            self.retired_corpora.discard(corpus)
+        release_corpus_cache(corpus)
+
+    def import_bank_exports(self):
+        """Stream raw bank exports into a corpus cache and load it as the corpus"""
+        file_paths = filedialog.askopenfilenames(
+            title="Import Bank Exports",
+            filetypes=[("Bank exports", "*.xlsx *.xls *.csv"), ("All files", "*.*")]
+        )
+        if not file_paths:
+            return
+
+        cache_path = filedialog.asksaveasfilename(
+            title="Save Corpus Cache",
+            defaultextension=".corpus",
+            initialdir=os.path.dirname(file_paths[0]),
+            initialfile="corpus.corpus",
+            filetypes=[("Corpus cache", "*.corpus"), ("All files", "*.*")]
+        )
+        if not cache_path:
+            return
+
+        # A mapped file cannot be replaced on Windows
+        if isinstance(self.corpus, CorpusCache) and \
+                os.path.abspath(self.corpus.path) == os.path.abspath(cache_path):
+            self.set_corpus([])
+
+        names = [os.path.basename(path) for path in file_paths]
+        events = queue.Queue()
+
+        def progress(file_index, rows_done):
+            events.put(("progress", (file_index, rows_done)))
+
+        def worker():
+            try:
+                events.put(("done", ingest_bank_exports(file_paths, cache_path, progress)))
+            except Exception as e:
+                events.put(("error", e))
+
+        def poll():
+            while True:
+                try:
+                    kind, value = events.get_nowait()
+                except queue.Empty:
+                    self.root.after(100, poll)
+                    return
+                if kind == "progress":
+                    file_index, rows_done = value
+                    self.status_label.config(
+                        text=f"Importing {names[file_index]} ({file_index + 1}/{len(names)}): {rows_done} movements"
+                    )
+                    continue
+                if kind == "error":
+                    self.status_label.config(text="Bank exports not imported")
+                    messagebox.showerror("Error", f"Error importing bank exports: {str(value)}")
+                    return
+
+                try:
+                    self.set_corpus(CorpusCache(cache_path))
+                except Exception as e:
+                    messagebox.showerror("Error", f"Error loading corpus cache: {str(e)}")
+                    return
+                self.status_label.config(
+                    text=f"Corpus loaded: {len(self.corpus)} movements imported from {len(names)} files "
+                         f"into {os.path.basename(cache_path)}"
+                )
+                return
+
+        self.status_label.config(text=f"Importing {len(names)} bank exports...")
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+    def check_corpus_ready(self):
+        """Show why the corpus cannot be evaluated, if that is the case"""
+        if not self.node_available:
+            messagebox.showinfo("Info", "Node.js is required to evaluate the corpus")
+            return False
+        if not self.patterns:
+            messagebox.showinfo("Info", "No patterns loaded")
+            return False
+        if not self.corpus:
+            messagebox.showinfo("Info", "No corpus loaded. Use Corpus > Load Corpus... first")
+            return False
+        return True
+
+    def evaluate_corpus(self):
+        """Evaluate every pattern over the loaded corpus using all cores"""
+        if not self.check_corpus_ready():
+            return
+
+        patterns = list(self.patterns)
+        rows = self.corpus
+        workers = default_worker_count()
+
+        eval_window = tk.Toplevel(self.root)
+        eval_window.title("Evaluate Corpus")
+        eval_window.geometry("700x600")
+        eval_window.transient(self.root)
+
+        eval_frame = ttk.Frame(eval_window, padding="10")
+        eval_frame.pack(fill=tk.BOTH, expand=True)
+
+        summary_label = ttk.Label(
+            eval_frame,
+            text=f"Sharding {len(rows)} movements...",
+            font=("Arial", 11, "bold")
+        )
+        summary_label.pack(anchor="w", pady=(0, 10))
+
+        # Per-shard progress
+        progress_frame = ttk.LabelFrame(eval_frame, text="Shards", padding="5")
+        progress_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        progress_canvas = tk.Canvas(progress_frame, highlightthickness=0)
+        progress_scrollbar = ttk.Scrollbar(progress_frame, orient=tk.VERTICAL, command=progress_canvas.yview)
+        progress_inner = ttk.Frame(progress_canvas)
+        progress_inner.bind('<Configure>', lambda e: progress_canvas.configure(scrollregion=progress_canvas.bbox('all')))
+        progress_canvas.create_window((0, 0), window=progress_inner, anchor='nw')
+        progress_canvas.configure(yscrollcommand=progress_scrollbar.set)
+        progress_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        progress_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        progress_bars = []
+
+        def show_shards(layout):
+            summary_label.config(text=f"Evaluating {len(patterns)} patterns over {len(rows)} movements "
+                                      f"({len(layout)} shards, {workers} workers)")
+            for i, (caja, first_date, last_date, size) in enumerate(layout):
+                ttk.Label(progress_inner, text=f"{caja}  {first_date} – {last_date}  ({size})").grid(
+                    row=i, column=0, sticky=tk.W, padx=5, pady=1)
+                bar = ttk.Progressbar(progress_inner, length=250, maximum=size)
+                bar.grid(row=i, column=1, sticky=tk.W, padx=5, pady=1)
+                progress_bars.append(bar)
+
+        # Results per pattern
+        result_frame = ttk.LabelFrame(eval_frame, text="Matches per pattern", padding="5")
+        result_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        result_tree = ttk.Treeview(result_frame, columns=("pattern", "matches", "errors", "first_error"),
+                                   show="headings", height=8)
+        result_tree.heading("pattern", text="Pattern")
+        result_tree.heading("matches", text="Matches")
+        result_tree.heading("errors", text="Errors")
+        result_tree.heading("first_error", text="First error")
+        result_tree.column("pattern", width=250)
+        result_tree.column("matches", width=80, anchor=tk.E)
+        result_tree.column("errors", width=60, anchor=tk.E)
+        result_tree.column("first_error", width=250)
+        result_tree.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Button(eval_frame, text="Close", command=eval_window.destroy).pack(side=tk.RIGHT, pady=(10, 0))
+
+        # Worker threads report through a queue, the UI polls it
+        events = queue.Queue()
+
+        def worker():
+            start = time.perf_counter()
+            try:
+                # Sharding scans every row, so it runs here instead of on the Tk thread
+                shards = shard_corpus(rows, workers * SHARDS_PER_WORKER)
+                events.put(("shards", [(caja, first, last, len(indices))
+                                       for caja, first, last, indices in shards], None))
+                errors = {}
+                results = evaluate_corpus(
+                    patterns, rows, workers=workers,
+                    progress=lambda shard, done, total: events.put(("progress", shard, done)),
+                    errors=errors, shards=shards
+                )
+                events.put(("done", (results, errors), time.perf_counter() - start))
+            except Exception as e:
+                events.put(("error", str(e), None))
+            finally:
+                self.release_corpus(rows)
+
+        def poll():
+            if not eval_window.winfo_exists():
+                return
+            try:
+                while True:
+                    kind, value, extra = events.get_nowait()
+                    if kind == "shards":
+                        show_shards(value)
+                    elif kind == "progress":
+                        progress_bars[value]['value'] = extra
+                    elif kind == "done":
+                        show_results(*value, extra)
+                        return
+                    else:
+                        messagebox.showerror("Error", f"Error evaluating corpus: {value}", parent=eval_window)
+                        return
+            except queue.Empty:
+                pass
+            eval_window.after(50, poll)
+
+        def show_results(results, errors, elapsed):
+            counts = [0] * len(patterns)
+            unmatched = 0
+            for hit in results:
+                if hit < 0:
+                    unmatched += 1
+                else:
+                    counts[hit] += 1
+            unmatched -= len(errors)
+            error_counts = [0] * len(patterns)
+            first_errors = {}
+            for index in sorted(errors):
+                pattern_index, message = errors[index]
+                error_counts[pattern_index] += 1
+                first_errors.setdefault(pattern_index, f"{rows[index][2]}: {message}")
+            for i, pattern in enumerate(patterns):
+                result_tree.insert("", tk.END, values=(pattern.get("description", f"Pattern {i+1}"), counts[i],
+                                                       error_counts[i], first_errors.get(i, "")))
+            result_tree.insert("", tk.END, values=("(no match)", unmatched, "", ""))
+
+            rate = len(rows) / elapsed if elapsed else 0
+            summary = f"Evaluated {len(rows)} movements in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+            if errors:
+                summary += f", {len(errors)} stopped by a throwing matcher"
+            summary_label.config(text=summary)
+            self.corpus_results = results
+            self.status_label.config(
+                text=f"Corpus evaluated: {len(rows) - unmatched - len(errors)} of {len(rows)} movements matched"
+            )
+
+        self.acquire_corpus(rows)
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+    def benchmark_corpus(self):
+        """Measure corpus evaluation throughput from 1 to 8 workers"""
+        if not self.check_corpus_ready():
+            return
+
+        patterns = list(self.patterns)
+        rows = self.corpus
+
+        bench_window = tk.Toplevel(self.root)
+        bench_window.title("Benchmark Evaluation")
+        bench_window.geometry("500x300")
+        bench_window.transient(self.root)
+
+        bench_text = scrolledtext.ScrolledText(bench_window, wrap=tk.WORD, font=('Consolas', 10))
+        bench_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        bench_text.insert(tk.END, f"Benchmarking {len(rows)} movements x {len(patterns)} patterns "
+                                  f"({default_worker_count()} cores available)...\n\n")
+
+        events = queue.Queue()
+
+        def worker():
+            try:
+                events.put(("done", benchmark_corpus_evaluation(patterns, rows)))
+            except Exception as e:
+                events.put(("error", str(e)))
+            finally:
+                self.release_corpus(rows)
+
+        def poll():
+            if not bench_window.winfo_exists():
+                return
+            try:
+                kind, value = events.get_nowait()
+            except queue.Empty:
+                bench_window.after(100, poll)
+                return
+            if kind == "error":
+                bench_text.insert(tk.END, f"Error running benchmark: {value}\n")
+                return
+            bench_text.insert(tk.END, f"{'Workers':>8} {'Seconds':>10} {'Rows/s':>12} {'Speedup':>8}\n")
+            for workers, elapsed, rate, speedup in value:
+                bench_text.insert(tk.END, f"{workers:>8} {elapsed:>10.2f} {rate:>12,.0f} {speedup:>7.2f}x\n")
+
+        self.acquire_corpus(rows)
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+    def preview_generator(self):
+        """Diff the saved and the edited generator over all matched corpus movements"""
+        if self.current_pattern_index is None:
+            messagebox.showinfo("Info", "No pattern selected")
+            return
+        if not self.check_corpus_ready():
+            return
+
+        pattern = self.patterns[self.current_pattern_index]
+        matcher = self.matcher_text.get("1.0", "end-1c").strip()
+        old_generator = pattern.get("generatorFunction", "")
+        new_generator = self.generator_text.get("1.0", "end-1c").strip()
+        rows = self.corpus
+
+        preview_window = tk.Toplevel(self.root)
+        preview_window.title("Preview Generator Change")
+        preview_window.geometry("900x650")
+        preview_window.transient(self.root)
+
+        preview_frame = ttk.Frame(preview_window, padding="10")
+        preview_frame.pack(fill=tk.BOTH, expand=True)
+
+        summary_label = ttk.Label(
+            preview_frame,
+            text=f"Running both generators for {pattern.get('description', 'Unnamed Pattern')} over {len(rows)} movements...",
+            font=("Arial", 11, "bold")
+        )
+        summary_label.pack(anchor="w", pady=(0, 5))
+
+        progress_bar = ttk.Progressbar(preview_frame, maximum=len(rows))
+        progress_bar.pack(fill=tk.X, pady=(0, 10))
+
+        notebook = ttk.Notebook(preview_frame)
+        notebook.pack(fill=tk.BOTH, expand=True)
+
+        def make_page(title, columns):
+            # A tab with a tree showing PREVIEW_PAGE_SIZE rows at a time
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=title)
+            tree = ttk.Treeview(frame, columns=[c for c, _, _ in columns], show="headings")
+            for column, heading, width in columns:
+                tree.heading(column, text=heading)
+                tree.column(column, width=width)
+            tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            nav = ttk.Frame(frame)
+            nav.pack(fill=tk.X, padx=5, pady=(0, 5))
+            page_label = ttk.Label(nav, text="")
+            page_label.pack(side=tk.LEFT)
+            pager = {"items": [], "page": 0, "tree": tree}
+
+            def show(page):
+                pages = max(1, -(-len(pager["items"]) // PREVIEW_PAGE_SIZE))
+                pager["page"] = min(max(page, 0), pages - 1)
+                tree.delete(*tree.get_children())
+                start = pager["page"] * PREVIEW_PAGE_SIZE
+                for offset, values in enumerate(pager["items"][start:start + PREVIEW_PAGE_SIZE]):
+                    tree.insert("", tk.END, iid=str(start + offset), values=values)
+                page_label.config(text=f"Page {pager['page'] + 1} of {pages} ({len(pager['items'])} rows)")
+
+            ttk.Button(nav, text="Next >", command=lambda: show(pager["page"] + 1)).pack(side=tk.RIGHT, padx=2)
+            ttk.Button(nav, text="< Previous", command=lambda: show(pager["page"] - 1)).pack(side=tk.RIGHT, padx=2)
+            pager["show"] = show
+            return pager
+
+        changes_page = make_page("Changes", [("count", "Movements", 90), ("kind", "Change", 80),
+                                             ("path", "Field", 330), ("old", "Old (first)", 180),
+                                             ("new", "New (first)", 180)])
+        partidas_page = make_page("Amounts per partida", [("partida", "Partida", 200), ("old", "Old total", 200),
+                                                          ("new", "New total", 200), ("delta", "Delta", 200)])
+        rows_page = make_page("Movements", [("caja", "Caja", 100), ("fecha", "Fecha", 100),
+                                            ("concepto", "Concepto", 420), ("importe", "Importe", 100),
+                                            ("changes", "Changes", 80)])
+
+        detail_text = scrolledtext.ScrolledText(rows_page["tree"].master, wrap=tk.WORD, height=8, font=('Consolas', 9))
+        detail_text.pack(fill=tk.X, padx=5, pady=(0, 5))
+
+        ttk.Button(preview_frame, text="Close", command=preview_window.destroy).pack(side=tk.RIGHT, pady=(10, 0))
+
+        result = {}
+        events = queue.Queue()
+        done_per_shard = {}
+
+        def worker():
+            def progress(shard, done, total):
+                events.put(("progress", shard, done))
+            try:
+                events.put(("done", preview_generator_change(matcher, old_generator, new_generator, rows,
+                                                             progress=progress), None))
+            except Exception as e:
+                events.put(("error", str(e), None))
+            finally:
+                self.release_corpus(rows)
+
+        def poll():
+            if not preview_window.winfo_exists():
+                return
+            try:
+                while True:
+                    kind, value, extra = events.get_nowait()
+                    if kind == "progress":
+                        done_per_shard[value] = extra
+                        progress_bar['value'] = sum(done_per_shard.values())
+                    elif kind == "done":
+                        show_preview(value)
+                        return
+                    else:
+                        summary_label.config(text=f"Error running generators: {value}")
+                        return
+            except queue.Empty:
+                pass
+            preview_window.after(50, poll)
+
+        def show_preview(preview):
+            result.update(preview)
+            progress_bar['value'] = len(rows)
+
+            groups = sorted(preview["groups"].items(), key=lambda item: (-item[1][0], item[0][1]))
+            changes_page["items"] = [
+                (count, kind, path, json.dumps(old, ensure_ascii=False), json.dumps(new, ensure_ascii=False))
+                for (kind, path), (count, old, new) in groups
+            ]
+            partidas_page["items"] = [
+                (partida, f"{old:,.2f}", f"{new:,.2f}", f"{new - old:+,.2f}")
+                for partida, (old, new) in sorted(preview["partidas"].items())
+            ]
+            changed = sorted(preview["changed"])
+            rows_page["items"] = [
+                (rows[i][0], rows[i][1], rows[i][2], rows[i][3], len(preview["changed"][i])) for i in changed
+            ]
+            rows_page["indices"] = changed
+            for page in (changes_page, partidas_page, rows_page):
+                page["show"](0)
+
+            summary = (f"{len(preview['matched'])} movements matched, {len(changed)} with different output, "
+                       f"{len(groups)} distinct field changes")
+            if preview["errors"]:
+                first = min(preview["errors"])
+                summary += f"\nMatcher threw on {len(preview['errors'])} movements (first: {preview['errors'][first]})"
+            summary_label.config(text=summary)
+
+        def on_row_select(event):
+            selection = rows_page["tree"].selection()
+            if not selection:
+                return
+            index = rows_page["indices"][int(selection[0])]
+            detail_text.delete(1.0, tk.END)
+            for kind, path, old, new in result["changed"][index]:
+                detail_text.insert(tk.END, f"{kind:8} {path}: {json.dumps(old, ensure_ascii=False)} -> "
+                                           f"{json.dumps(new, ensure_ascii=False)}\n")
+
+        rows_page["tree"].bind('<<TreeviewSelect>>', on_row_select)
+
+        self.acquire_corpus(rows)
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+    def refresh_usage_stats(self):
+        """Recount matchCount/lastUsed of every pattern from the app database"""
+        if not self.patterns:
+            messagebox.showinfo("Info", "No patterns loaded")
+            return
+
+        if not self.db_path:
+            db_path = filedialog.askopenfilename(
+                title="Open Accounting Database",
+                filetypes=[("SQLite databases", "*.sqlite *.db"), ("All files", "*.*")]
+            )
+            if not db_path:
+                return
+            self.db_path = db_path
+
+        self.status_label.config(text=f"Aggregating usage from {os.path.basename(self.db_path)}...")
+        events = queue.Queue()
+
+        def worker():
+            try:
+                events.put(("done", query_usage_stats(self.db_path)))
+            except Exception as e:
+                events.put(("error", e))
+
+        def poll():
+            try:
+                kind, value = events.get_nowait()
+            except queue.Empty:
+                self.root.after(100, poll)
+                return
+            if kind == "error":
+                self.status_label.config(text="Usage stats not refreshed")
+                messagebox.showerror("Error", f"Error reading usage from the database: {str(value)}")
+                if isinstance(value, sqlite3.DatabaseError):
+                    self.db_path = None  # Ask for another file next time
+                return
+
+            stats, missing_indexes, covered = value
+            used = apply_usage_stats(self.patterns, stats)
+            self.update_pattern_list()
+            if self.current_pattern_index is not None:
+                self.pattern_listbox.selection_set(self.list_order.index(self.current_pattern_index))
+            if self.file_path:
+                self.save_file()
+
+            unattributed = sum(count for (description, _), (count, _) in stats.items() if description is None)
+            summary = f"Usage stats refreshed: {used} of {len(self.patterns)} patterns used"
+            if unattributed:
+                summary += f", {unattributed} movements without pattern information"
+            if not covered and not missing_indexes:
+                summary += (f" (SQLite {sqlite3.sqlite_version} still reads the task data of every summary row; "
+                            f"the usage index covers the query from SQLite "
+                            f"{'.'.join(map(str, USAGE_STATS_COVERING_VERSION))})")
+            self.status_label.config(text=summary)
+
+            if usage_index_can_cover():
+                benefit = "This index lets SQLite answer it without reading the task data:"
+            else:
+                benefit = (f"This index lets SQLite read only the summary rows. SQLite {sqlite3.sqlite_version} "
+                           f"still reads their task data; from SQLite "
+                           f"{'.'.join(map(str, USAGE_STATS_COVERING_VERSION))} the index covers the query:")
+            if missing_indexes and messagebox.askyesno(
+                "Suggested Index",
+                "The usage query scans the whole accounting_tasks table. " + benefit + "\n\n"
+                + "\n\n".join(missing_indexes)
+                + "\n\nCreate it now? Close the main application first; this can take a while on a large database."
+            ):
+                try:
+                    create_usage_indexes(self.db_path, missing_indexes)
+                    self.status_label.config(text="Usage index created")
+                except Exception as e:
+                    messagebox.showerror("Error", f"Error creating the index: {str(e)}")
+
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
+    def analyze_regex_cost(self):
+        """Rank the regex literals of all matchers by measured backtracking cost"""
+        if not self.patterns:
+            messagebox.showinfo("Info", "No patterns loaded")
+            return
+        if not self.node_available:
+            messagebox.showinfo("Info", "Node.js is required to time the regexes")
+            return
+
+        patterns = list(self.patterns)
+        corpus = self.corpus
+
+        regex_window = tk.Toplevel(self.root)
+        regex_window.title("Regex Cost Analysis")
+        regex_window.geometry("900x500")
+        regex_window.transient(self.root)
+
+        regex_frame = ttk.Frame(regex_window, padding="10")
+        regex_frame.pack(fill=tk.BOTH, expand=True)
+
+        summary_label = ttk.Label(regex_frame, text="Selecting timing inputs from the corpus...",
+                                  font=("Arial", 11, "bold"))
+        summary_label.pack(anchor="w", pady=(0, 10))
+
+        columns = ("rank", "pattern", "regex", "worst", "warnings")
+        regex_tree = ttk.Treeview(regex_frame, columns=columns, show="headings")
+        for column, heading, width in [("rank", "#", 40), ("pattern", "Pattern", 200), ("regex", "Regex", 250),
+                                       ("worst", "Worst case", 90), ("warnings", "Warnings", 300)]:
+            regex_tree.heading(column, text=heading)
+            regex_tree.column(column, width=width, anchor=tk.E if column in ("rank", "worst") else tk.W)
+        regex_tree.pack(fill=tk.BOTH, expand=True)
+
+        detail_label = ttk.Label(regex_frame, text="Double-click a row to open its pattern", wraplength=850)
+        detail_label.pack(anchor="w", pady=(5, 0))
+
+        ttk.Button(regex_frame, text="Close", command=regex_window.destroy).pack(side=tk.RIGHT, pady=(10, 0))
+
+        findings = []
+        events = queue.Queue()
+
+        def worker():
+            try:
+                # Decoding and selecting the concepts takes seconds on a large corpus
+                try:
+                    sample = select_adversarial_concepts(row[2] for row in corpus)
+                finally:
+                    self.release_corpus(corpus)
+                events.put(("sample", len(sample)))
+                events.put(("done", analyze_pattern_regexes(patterns, sample)))
+            except Exception as e:
+                events.put(("error", str(e)))
+
+        def poll():
+            if not regex_window.winfo_exists():
+                return
+            try:
+                kind, value = events.get_nowait()
+            except queue.Empty:
+                regex_window.after(100, poll)
+                return
+            if kind == "sample":
+                source_text = (f"{value} corpus concepts" if value
+                               else "synthetic inputs only (load a corpus for real concepts)")
+                summary_label.config(text=f"Timing regex literals against {source_text}...")
+                regex_window.after(100, poll)
+                return
+            if kind == "error":
+                summary_label.config(text=f"Error analyzing regexes: {value}")
+                return
+            findings.extend(value)
+            for rank, finding in enumerate(findings, start=1):
+                if finding["error"]:
+                    worst = "error"
+                elif finding["timed_out"]:
+                    worst = f"> {REGEX_TIMEOUT_SECONDS}s"
+                else:
+                    worst = f"{finding['max_ms']:.2f} ms"
+                warnings = "; ".join(finding["warnings"]) or finding["error"] or ""
+                regex_tree.insert("", tk.END, iid=str(rank - 1), values=(
+                    rank, finding["description"], f"/{finding['source']}/{finding['flags']}", worst, warnings))
+            flagged = sum(1 for f in findings if f["warnings"] or f["timed_out"])
+            summary_label.config(text=f"{len(findings)} regex literals, {flagged} flagged. Fix from the top down.")
+
+            # Make the measured costs visible in the matcher editor
+            self.matcher_text.regex_costs = {
+                (f["source"], f["flags"]): f["max_ms"] for f in findings if not f["error"]
+            }
+            self.matcher_text.mark_regex_warnings()
+
+        def on_select(event):
+            selection = regex_tree.selection()
+            if selection:
+                finding = findings[int(selection[0])]
+                worst_input = finding["worst_input"] or ""
+                detail_label.config(text=f"Slowest input ({len(worst_input)} chars): {worst_input[:200]!r}")
+
+        def on_open(event):
+            selection = regex_tree.selection()
+            if selection:
+                index = findings[int(selection[0])]["pattern_index"]
+                if index < len(self.patterns):
+                    self.select_pattern(index)
+
+        regex_tree.bind('<<TreeviewSelect>>', on_select)
+        regex_tree.bind('<Double-1>', on_open)
+
+        self.acquire_corpus(corpus)
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+
     def show_about(self):
         """Display about dialog with information about the application"""
         about_window = tk.Toplevel(self.root)
@@ -811,7 +3623,540 @@ console.log(JSON.stringify({{
         ttk.Button(about_frame, text="Close", command=about_window.destroy).pack()
 
 
+# Scale benchmarks
+#
+# Synthetic pattern files and movement corpora of the shape the app uses, and
+# a benchmark that drives the editor over them. Run as
+#
+#   python enhanced-pattern-editor-with-descriptions.py benchmark [options]
+#   python enhanced-pattern-editor-with-descriptions.py generate [options]
+#
+# Results are written as JSON and compared with a stored baseline. Editor
+# timings need Tk: without a display the benchmark starts Xvfb if it is
+# installed, otherwise only the corpus timings are taken.
+
+# Default sizes: pattern file sizes and corpus sizes
+BENCHMARK_PATTERN_COUNTS = (10, 1000, 10000)
+BENCHMARK_CORPUS_SIZES = (1000, 10000, 100000, 1000000)
+
+# Timed runs per measurement and keystrokes typed for highlight_text
+BENCHMARK_REPEATS = 5
+BENCHMARK_KEYSTROKES = 50
+
+# Corpus evaluation is only timed up to this many matcher calls (patterns x rows)
+BENCHMARK_MAX_EVALUATIONS = 20000000
+
+# A metric regresses when its median is this much slower than the baseline,
+# and at least BENCHMARK_NOISE_MS slower (so sub-millisecond jitter is ignored)
+BENCHMARK_TOLERANCE = 0.25
+BENCHMARK_NOISE_MS = 1.0
+
+# Baseline used when --baseline is not given
+BENCHMARK_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark-baseline.json")
+
+# Every caja of BANK_EXPORTS, as stored in the database
+BENCHMARK_CAJAS = [caja for export in BANK_EXPORTS for caja in [export[4], *export[5].values()]]
+
+# Words synthetic concepts are made of
+BENCHMARK_CONCEPT_WORDS = [
+    'TRANSFERENCIA', 'RECIBO', 'LIQUIDACION', 'TASA', 'IBI', 'SUBVENCION', 'NOMINA', 'COMISION',
+    'DEVOLUCION', 'REMESA', 'SEPA', 'AYUNTAMIENTO', 'DIPUTACION', 'TRIBUTOS', 'AGUA', 'BASURA',
+]
+
+
+def synthetic_pattern_key(index):
+    """Concept keyword and caja matched by synthetic pattern number ``index``"""
+    words = BENCHMARK_CONCEPT_WORDS
+    keyword = f"{words[index % len(words)]} {words[(index // len(words)) % len(words)]} {index:05d}"
+    return keyword, BENCHMARK_CAJAS[index % len(BENCHMARK_CAJAS)]
+
+
+def synthetic_pattern(index):
+    """Build synthetic pattern number ``index``.
+
+    The matcher tests a concept regex and a bank, some also an amount range;
+    the generator returns one to three arqueo operations, plus an ado220 one
+    for every other pattern, like the shipped patterns.
+    """
+    keyword, caja = synthetic_pattern_key(index)
+    regex = r'\s+'.join(re.escape(word) for word in keyword.split())
+    bank = caja.split('_')[0]
+
+    conditions = ['conceptMatch', 'isBank']
+    matcher = [
+        "(data) => {",
+        "      const [caja, fecha, concepto, importe] = data;",
+        "      ",
+        "      // Match by concept pattern",
+        f"      const conceptMatch = /{regex}/i.test(concepto);",
+        "      ",
+        "      // - Specific banks or accounts",
+        f"      const isBank = caja == '{bank}';",
+    ]
+    if index % 3 == 0:
+        conditions.append('isAmount')
+        matcher += [
+            "      ",
+            "      // - Amount ranges",
+            f"      const isAmount = importe > {index % 50 * 10};",
+        ]
+    matcher += [
+        "      ",
+        f"      return {' && '.join(conditions)};",
+        "    }",
+    ]
+
+    operations = []
+    for operation in range(1 + index % 3):
+        partida = ('42000', '130', '39900')[operation]
+        operations += [
+            "          {",
+            '            tipo: "arqueo",',
+            "            detalle: {",
+            "              fecha: fecha,",
+            "              caja: cajaReal,",
+            f'              tercero: "S28{index:05d}J",',
+            '              naturaleza: "4",',
+            "              final: [",
+            f'                {{ partida: "{partida}", IMPORTE_PARTIDA: importe{operation + 1} }},',
+            '                { partida: "Total", IMPORTE_PARTIDA: 0.0 }',
+            "              ],",
+            "              texto_sical: [{ ",
+            f"                tcargo: `{keyword} ${{obtenerMes(fecha)}}`, ",
+            '                ado: "" ',
+            "              }]",
+            "            }",
+            "          },",
+        ]
+    if index % 2 == 0:
+        operations += [
+            "          {",
+            '            tipo: "ado220",',
+            "            detalle: {",
+            "              fecha: fecha,",
+            '              expediente: "rbt-apunte-ADO",',
+            f'              tercero: "P91{index:05d}E",',
+            '              fpago: "10",',
+            '              tpago: "10",',
+            "              caja: cajaReal,",
+            '              texto: "AUTOMATICO " + concepto.substring(0, 30),',
+            "              aplicaciones: [{",
+            f'                funcional: "{160 + index % 40}", ',
+            f'                economica: "{400 + index % 90}",',
+            "                gfa: null, ",
+            "                importe: importe,",
+            '                cuenta: "6501"',
+            "              }]",
+            "            }",
+            "          },",
+        ]
+    operation_count = 1 + index % 3 + (index % 2 == 0)
+
+    generator = [
+        "(data) => {",
+        "      const [caja, fecha, concepto, importe] = data;",
+        "      const cajaReal = caja.split('_')[0];",
+        "      ",
+        "      // Calculate sub-amounts based on rules",
+        "      const importe1 = Math.round(importe * 0.96 * 100) / 100;",
+        "      const importe2 = Math.round(importe * 0.034 * 100) / 100;",
+        "      const importe3 = Math.round(importe * 0.006 * 100) / 100;",
+        "      const normalizedImporte = String(importe).replace(/,/g, '');",
+        "      ",
+        "      return {",
+        "        id_task: caja+'_'+fecha+'_'+normalizedImporte,",
+        f"        num_operaciones: {operation_count},",
+        "        liquido_operaciones: importe,",
+        "        operaciones: [",
+        *operations,
+        "        ]",
+        "      };",
+        "    }",
+    ]
+
+    return {
+        "description": f"{keyword.title()} ({bank})",
+        "matcherFunction": "\n".join(matcher),
+        "generatorFunction": "\n".join(generator),
+        "isFavorite": index % 25 == 0,
+        "lastUsed": None,
+        "matchCount": 0,
+        "createdAt": "2025-01-01T00:00:00.000Z",
+    }
+
+
+def generate_synthetic_patterns(count):
+    """Return a list of ``count`` synthetic patterns"""
+    return [synthetic_pattern(index) for index in range(count)]
+
+
+def generate_synthetic_movements(count, pattern_count, seed=0):
+    """Yield ``count`` corpus rows [caja, fecha, concepto, importe].
+
+    Most rows carry the keyword and caja of one of the first ``pattern_count``
+    synthetic patterns, the rest are noise that no pattern matches. Dates
+    span 2019-2025.
+    """
+    rng = random.Random(seed)
+    words = BENCHMARK_CONCEPT_WORDS
+    for _ in range(count):
+        if pattern_count and rng.random() < 0.8:
+            keyword, caja = synthetic_pattern_key(rng.randrange(pattern_count))
+            concepto = f"{keyword} REF {rng.randrange(10 ** 8):08d}"
+        else:
+            caja = rng.choice(BENCHMARK_CAJAS)
+            concepto = ' '.join(rng.choice(words) for _ in range(rng.randint(2, 6)))
+        fecha = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2019, 2025)}"
+        yield [caja, fecha, concepto, round(rng.uniform(-5000, 150000), 2)]
+
+
+def write_synthetic_files(output_dir, pattern_counts, corpus_sizes, seed=0):
+    """Write patterns-<n>.json and movements-<n>.corpus files.
+
+    Returns ({count: path}, {size: path}).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pattern_files = {}
+    for count in pattern_counts:
+        path = os.path.join(output_dir, f"patterns-{count}.json")
+        with open(path, 'w') as file:
+            json.dump(generate_synthetic_patterns(count), file, indent=2)
+        pattern_files[count] = path
+
+    corpus_files = {}
+    for size in corpus_sizes:
+        path = os.path.join(output_dir, f"movements-{size}.corpus")
+        writer = CorpusCacheWriter(path)
+        try:
+            for row in generate_synthetic_movements(size, max(pattern_counts, default=0), seed):
+                writer.add(*row)
+            writer.close()
+        except BaseException:
+            writer.discard()
+            raise
+        corpus_files[size] = path
+    return pattern_files, corpus_files
+
+
+def time_call(function, repeats=1):
+    """Run function ``repeats`` times and summarize the timings in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize_timings(samples)
+
+
+def summarize_timings(samples):
+    """Median, min and max of a list of timings in milliseconds"""
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+        "runs": len(samples),
+    }
+
+
+def start_virtual_display():
+    """Start Xvfb when running on Linux without a display.
+
+    Sets DISPLAY and returns the Xvfb process, or None when a display is
+    already available or Xvfb is not installed.
+    """
+    if not sys.platform.startswith('linux') or os.environ.get('DISPLAY') or not shutil.which('Xvfb'):
+        return None
+    for number in range(99, 199):
+        if os.path.exists(f'/tmp/.X{number}-lock'):
+            continue
+        process = subprocess.Popen(
+            ['Xvfb', f':{number}', '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and process.poll() is None:
+            if os.path.exists(f'/tmp/.X11-unix/X{number}'):
+                os.environ['DISPLAY'] = f':{number}'
+                return process
+            time.sleep(0.05)
+        process.kill()
+        process.wait()
+    return None
+
+
+def benchmark_editor(patterns_path, repeats, keystrokes, save_path):
+    """Time the editor operations on one pattern file.
+
+    Dialogs are answered without user interaction: file dialogs return
+    ``patterns_path`` and message boxes make the benchmark fail with a
+    RuntimeError. Returns ({operation: timings}, {operation: skip reason}).
+    Raises tk.TclError without a display.
+    """
+    root = tk.Tk()
+    messages = []
+    replaced = {
+        (filedialog, 'askopenfilename'): lambda **kwargs: patterns_path,
+        (filedialog, 'asksaveasfilename'): lambda **kwargs: save_path,
+        (messagebox, 'showinfo'): lambda *args, **kwargs: messages.append(args),
+        (messagebox, 'showwarning'): lambda *args, **kwargs: messages.append(args),
+        (messagebox, 'showerror'): lambda *args, **kwargs: messages.append(args),
+        (messagebox, 'askyesno'): lambda *args, **kwargs: messages.append(args) or False,
+    }
+    originals = {key: getattr(*key) for key in replaced}
+    for (module, name), function in replaced.items():
+        setattr(module, name, function)
+
+    app = None
+    try:
+        app = TransactionPatternEditor(root)
+        root.update()
+        messages.clear()  # Node.js warning, reported in the environment instead
+
+        def open_file():
+            app.open_file()
+            root.update_idletasks()
+
+        results = {"open_file": time_call(open_file, repeats)}
+        results["update_pattern_list"] = time_call(app.update_pattern_list, repeats)
+
+        # Select patterns spread over the whole list
+        samples = []
+        for step in range(repeats):
+            position = step * (len(app.patterns) - 1) // max(1, repeats - 1)
+            app.pattern_listbox.selection_clear(0, tk.END)
+            app.pattern_listbox.selection_set(position)
+            start = time.perf_counter()
+            app.on_pattern_select(None)
+            root.update_idletasks()
+            samples.append((time.perf_counter() - start) * 1000)
+        results["on_pattern_select"] = summarize_timings(samples)
+
+        # Type into the longest generator, highlighting after every key
+        longest = max(range(len(app.patterns)), key=lambda i: len(app.patterns[i].get("generatorFunction", "")))
+        app.select_pattern(longest)
+        editor = app.generator_text
+        editor.mark_set('insert', '3.end')
+        samples = []
+        for _ in range(keystrokes):
+            editor.insert('insert', 'x')
+            start = time.perf_counter()
+            editor.highlight_text()
+            samples.append((time.perf_counter() - start) * 1000)
+        results["highlight_text"] = summarize_timings(samples)
+        app.on_pattern_select(None)  # Drop the typed text
+
+        app.file_path = save_path
+        results["save_file"] = time_call(app.save_file, repeats)
+
+        skipped = {}
+        if app.node_available:
+            def test_pattern():
+                try:
+                    app.test_pattern()
+                    root.update_idletasks()
+                finally:
+                    for window in root.winfo_children():
+                        if isinstance(window, tk.Toplevel):
+                            window.destroy()
+
+            try:
+                results["test_pattern"] = time_call(test_pattern, repeats)
+            except tk.TclError as e:
+                skipped["test_pattern"] = f"Test dialog failed: {e}"
+        else:
+            skipped["test_pattern"] = "Node.js not found"
+
+        if messages:
+            raise RuntimeError("The editor reported: " + "; ".join(" ".join(map(str, m)) for m in messages))
+        return results, skipped
+    finally:
+        if app is not None:
+            app.code_checker.close()
+        root.destroy()
+        for (module, name), function in originals.items():
+            setattr(module, name, function)
+
+
+def benchmark_corpus(patterns, corpus_path, repeats):
+    """Time opening, sharding and evaluating one corpus cache file.
+
+    Evaluation is timed once, and only when it takes at most
+    BENCHMARK_MAX_EVALUATIONS matcher calls. Returns {operation: timings}.
+    """
+    results = {"open_corpus": time_call(lambda: CorpusCache(corpus_path).close(), repeats)}
+    corpus = CorpusCache(corpus_path)
+    try:
+        results["shard_corpus"] = time_call(lambda: shard_corpus(corpus, default_worker_count() * SHARDS_PER_WORKER))
+        if shutil.which('node') and len(patterns) * len(corpus) <= BENCHMARK_MAX_EVALUATIONS:
+            results["evaluate_corpus"] = time_call(lambda: evaluate_corpus(patterns, corpus))
+    finally:
+        corpus.close()
+    return results
+
+
+def compare_with_baseline(metrics, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """Return the metrics whose median regressed against the baseline results"""
+    regressions = []
+    for name, result in metrics.items():
+        previous = baseline.get("metrics", {}).get(name)
+        if not previous:
+            continue
+        limit = previous["median_ms"] * (1 + tolerance)
+        if result["median_ms"] > limit and result["median_ms"] - previous["median_ms"] >= BENCHMARK_NOISE_MS:
+            regressions.append({
+                "metric": name,
+                "baseline_ms": previous["median_ms"],
+                "median_ms": result["median_ms"],
+                "ratio": result["median_ms"] / previous["median_ms"] if previous["median_ms"] else None,
+            })
+    return regressions
+
+
+def run_benchmarks(pattern_counts=BENCHMARK_PATTERN_COUNTS, corpus_sizes=BENCHMARK_CORPUS_SIZES,
+                   repeats=BENCHMARK_REPEATS, keystrokes=BENCHMARK_KEYSTROKES, work_dir=None, progress=None):
+    """Generate the synthetic files and run every benchmark over them.
+
+    Metrics are named like "open_file[patterns=1000]". Returns the results
+    dict written by the benchmark command; ``progress`` is called with a
+    message before each step.
+    """
+    progress = progress or (lambda message: None)
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='pattern-benchmark-')
+    display = start_virtual_display()
+    results = {
+        "created": datetime.datetime.now().isoformat(timespec='seconds'),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": default_worker_count(),
+            "node": bool(shutil.which('node')),
+            "display": os.environ.get('DISPLAY', ''),
+            "xvfb": display is not None,
+        },
+        "metrics": {},
+        "skipped": {},
+    }
+    try:
+        progress("Generating synthetic patterns and movements")
+        pattern_files, corpus_files = write_synthetic_files(work_dir, pattern_counts, corpus_sizes)
+
+        for count, path in pattern_files.items():
+            progress(f"Editor with {count} patterns")
+            try:
+                timings, skipped = benchmark_editor(path, repeats, keystrokes, os.path.join(work_dir, 'saved.json'))
+            except tk.TclError as e:
+                results["skipped"][f"editor[patterns={count}]"] = f"Tk not available: {e}"
+                continue
+            except RuntimeError as e:
+                results["skipped"][f"editor[patterns={count}]"] = str(e)
+                continue
+            for name, timing in timings.items():
+                results["metrics"][f"{name}[patterns={count}]"] = timing
+            for name, reason in skipped.items():
+                results["skipped"][f"{name}[patterns={count}]"] = reason
+
+        for count, path in pattern_files.items():
+            with open(path, 'r') as file:
+                patterns = json.load(file)
+            for size, corpus_path in corpus_files.items():
+                progress(f"Corpus of {size} movements with {count} patterns")
+                timings = benchmark_corpus(patterns, corpus_path, repeats)
+                for name, timing in timings.items():
+                    if name == "evaluate_corpus":
+                        results["metrics"][f"{name}[patterns={count},rows={size}]"] = timing
+                    elif count == pattern_counts[0]:
+                        results["metrics"][f"{name}[rows={size}]"] = timing
+                if "evaluate_corpus" not in timings:
+                    results["skipped"][f"evaluate_corpus[patterns={count},rows={size}]"] = (
+                        "Node.js not found" if not shutil.which('node')
+                        else f"more than {BENCHMARK_MAX_EVALUATIONS} matcher calls"
+                    )
+    finally:
+        if display is not None:
+            display.terminate()
+            display.wait()
+            del os.environ['DISPLAY']
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def benchmark_command(args):
+    """Command line entry point of the benchmark and generate commands"""
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    benchmark = commands.add_parser("benchmark", help="time the editor on synthetic data")
+    benchmark.add_argument("--patterns", type=int, nargs="+", default=list(BENCHMARK_PATTERN_COUNTS),
+                           help="pattern file sizes")
+    benchmark.add_argument("--rows", type=int, nargs="+", default=list(BENCHMARK_CORPUS_SIZES),
+                           help="corpus sizes")
+    benchmark.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS)
+    benchmark.add_argument("--keystrokes", type=int, default=BENCHMARK_KEYSTROKES)
+    benchmark.add_argument("--output", help="write the results here instead of stdout")
+    benchmark.add_argument("--baseline", default=BENCHMARK_BASELINE_PATH,
+                           help="results to compare with (default: %(default)s)")
+    benchmark.add_argument("--save-baseline", action="store_true",
+                           help="store these results as the new baseline")
+    benchmark.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE,
+                           help="allowed slowdown before flagging a regression (default: %(default)s)")
+    benchmark.add_argument("--work-dir", help="keep the synthetic files in this directory")
+
+    generate = commands.add_parser("generate", help="write synthetic pattern files and corpora")
+    generate.add_argument("--patterns", type=int, nargs="+", default=list(BENCHMARK_PATTERN_COUNTS))
+    generate.add_argument("--rows", type=int, nargs="+", default=list(BENCHMARK_CORPUS_SIZES))
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--output-dir", required=True)
+
+    options = parser.parse_args(args)
+    log = lambda message: print(message, file=sys.stderr)
+
+    if options.command == "generate":
+        pattern_files, corpus_files = write_synthetic_files(
+            options.output_dir, options.patterns, options.rows, options.seed
+        )
+        for path in [*pattern_files.values(), *corpus_files.values()]:
+            log(f"Written {path}")
+        return 0
+
+    results = run_benchmarks(options.patterns, options.rows, options.repeats, options.keystrokes,
+                             options.work_dir, progress=log)
+
+    results["regressions"] = []
+    if os.path.exists(options.baseline):
+        with open(options.baseline, 'r') as file:
+            baseline = json.load(file)
+        results["baseline"] = options.baseline
+        results["regressions"] = compare_with_baseline(results["metrics"], baseline, options.tolerance)
+    else:
+        log(f"No baseline at {options.baseline}, nothing to compare with")
+
+    output = json.dumps(results, indent=2)
+    if options.output:
+        with open(options.output, 'w') as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if options.save_baseline:
+        with open(options.baseline, 'w') as file:
+            file.write(output + "\n")
+        log(f"Baseline saved to {options.baseline}")
+
+    for name, reason in results["skipped"].items():
+        log(f"Skipped {name}: {reason}")
+    for regression in results["regressions"]:
+        log(f"REGRESSION {regression['metric']}: {regression['median_ms']:.2f} ms "
+            f"(baseline {regression['baseline_ms']:.2f} ms)")
+    return 1 if results["regressions"] else 0
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("benchmark", "generate"):
+        sys.exit(benchmark_command(sys.argv[1:]))
+
     root = tk.Tk()
     app = TransactionPatternEditor(root)
     root.mainloop()